@@ -1,7 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from core.models import User, HydroponicSystem, SensorReading
+from core.models import (
+    Alert,
+    AlertRule,
+    HydroponicSystem,
+    RetentionPolicy,
+    SensorReading,
+    User,
+)
 
 admin.site.register(User, UserAdmin)
 admin.site.register(HydroponicSystem)
 admin.site.register(SensorReading)
+admin.site.register(RetentionPolicy)
+admin.site.register(AlertRule)
+admin.site.register(Alert)
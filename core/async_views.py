@@ -0,0 +1,207 @@
+import asyncio
+import json
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    ValidationError,
+)
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+from core.authentication import AsyncSessionAuthentication, CachedTokenAuthentication
+from core.db.routers import aget_replica
+from core.filters import AsyncSensorReadingFilter
+from core.live import get_hub
+from core.models import HydroponicSystem, SensorReading
+from core.paginations import SensorReadingCursorPagination
+from core.parsers import SensorReadingBinaryParser
+from core.permissions import check_hydroponic_system_owner
+from core.serializers import SensorReadingSerializer, ValuesSerializer
+from core.views import SensorReadingViewSet
+
+# The views below serve the same requests as the corresponding sync views, but
+# they never block the event loop of an ASGI server on authentication, queries
+# or inserts, so a single process can keep many slow connections open.
+AUTHENTICATORS = [CachedTokenAuthentication(), AsyncSessionAuthentication()]
+PARSERS = [JSONParser(), SensorReadingBinaryParser()]
+
+
+async def authenticate(request):
+    for authenticator in AUTHENTICATORS:
+        user_auth = await authenticator.aauthenticate(request)
+        if user_auth is not None:
+            request.user, request.auth = user_auth
+            return
+
+    raise NotAuthenticated()
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+async def dispatch(request, handlers):
+    request = Request(request, parsers=PARSERS)
+
+    try:
+        await authenticate(request)
+        handler = handlers.get(request.method)
+        if handler is None:
+            raise MethodNotAllowed(request.method)
+        data, status_code = await handler(request)
+    except APIException as exc:
+        return handle_exception(exc)
+
+    return render(data, status_code)
+
+
+def handle_exception(exc):
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        exc.auth_header = CachedTokenAuthentication.keyword
+    response = exception_handler(exc, {})
+    headers = {
+        name: value
+        for name, value in response.items()
+        if name.lower() != "content-type"
+    }
+    return render(response.data, response.status_code, headers)
+
+
+async def list_sensor_readings(request):
+    view = SensorReadingViewSet(
+        request=request, action="list", args=(), kwargs={}, format_kwarg=None
+    )
+    queryset = SensorReading.objects.filter(owner=request.user)
+    replica = await aget_replica(request.user.pk)
+    if replica is not None:
+        queryset = queryset.using(replica)
+
+    filterset = AsyncSensorReadingFilter(
+        request.query_params, queryset=queryset, request=request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+
+    values_serializer = ValuesSerializer.for_serializer(SensorReadingSerializer)
+    paginator = SensorReadingCursorPagination()
+    rows = await paginator.apaginate_queryset(
+        filterset.qs.values(*values_serializer.sources), request, view
+    )
+    data = values_serializer.to_representation(rows)
+    return paginator.get_paginated_response(data).data, status.HTTP_200_OK
+
+
+async def get_hydroponic_system(data):
+    # Loads the system of the reading with the single lookup of the sync view.
+    # Invalid and unknown ids are left to the serializer to report.
+    try:
+        pk = int(data.get("hydroponic_system"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+    systems = HydroponicSystem.objects.only("id", "owner_id")
+    try:
+        return await systems.aget(pk=pk)
+    except HydroponicSystem.DoesNotExist:
+        return None
+
+
+async def create_sensor_reading(request):
+    data = request.data
+    system = await get_hydroponic_system(data)
+    context = {
+        "request": request,
+        "hydroponic_systems": {} if system is None else {system.pk: system},
+    }
+    serializer = SensorReadingSerializer(data=data, context=context)
+    serializer.is_valid(raise_exception=True)
+    check_hydroponic_system_owner(
+        request, [serializer.validated_data["hydroponic_system"]]
+    )
+    [reading] = await SensorReading.objects.aingest(
+        [SensorReading(**serializer.validated_data)]
+    )
+    return SensorReadingSerializer(reading).data, status.HTTP_201_CREATED
+
+
+@csrf_exempt
+async def sensor_reading_list_create(request):
+    return await dispatch(
+        request, {"GET": list_sensor_readings, "POST": create_sensor_reading}
+    )
+
+
+async def stream_sensor_readings(hub, subscription):
+    # Sends every reading as an event with the reading id as the event id, and
+    # a comment when there are no readings for a while, so that proxies keep
+    # the connection open and closed connections are noticed.
+    try:
+        try:
+            await asyncio.wait_for(
+                hub.listening.wait(), settings.SENSOR_READING_LIVE_KEEPALIVE
+            )
+        except asyncio.TimeoutError:
+            pass
+        yield ": connected\n\n"
+
+        while True:
+            try:
+                item = await subscription.get(settings.SENSOR_READING_LIVE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            data = json.dumps(item, separators=(",", ":"))
+            yield f"id: {item['id']}\nevent: sensor_reading\ndata: {data}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def sensor_reading_live(request):
+    request = Request(request)
+
+    try:
+        if not settings.SENSOR_READING_LIVE_ENABLED:
+            raise NotFound()
+        await authenticate(request)
+        if request.method != "GET":
+            raise MethodNotAllowed(request.method)
+
+        system_id = request.query_params.get("hydroponic_system")
+        if system_id is not None:
+            try:
+                system_id = int(system_id)
+            except ValueError:
+                raise ValidationError(
+                    {"hydroponic_system": ["A valid integer is required."]}
+                )
+            systems = HydroponicSystem.objects.filter(owner=request.user)
+            if not await systems.filter(pk=system_id).aexists():
+                raise NotFound()
+    except APIException as exc:
+        return handle_exception(exc)
+
+    hub = get_hub()
+    subscription = hub.subscribe(request.user.pk, system_id)
+    response = StreamingHttpResponse(
+        stream_sensor_readings(hub, subscription), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stops nginx from buffering the events.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,83 @@
+from copy import copy
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    SessionAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from core.cache import (
+    aget_cached_auth,
+    aset_cached_auth,
+    get_cached_auth,
+    get_token_auth_key,
+    set_cached_auth,
+)
+
+
+class AsyncTokenAuthentication(TokenAuthentication):
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related("user").aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+
+        return (token.user, token)
+
+
+class AsyncSessionAuthentication(SessionAuthentication):
+    async def aauthenticate(self, request):
+        user = await request._request.auser()
+
+        if not user or not user.is_active:
+            return None
+
+        self.enforce_csrf(request)
+        return (user, None)
+
+
+class CachedTokenAuthentication(AsyncTokenAuthentication):
+    # Caches the users and tokens of valid keys, so authenticating a known
+    # token usually needs no query. The entries are deleted when the token is
+    # deleted (e.g. on logout) or the user is saved (e.g. on a password change
+    # or deactivation). Users are copied, so that requests cannot modify them.
+    def authenticate_credentials(self, key):
+        cache_key = get_token_auth_key(key)
+        user_auth = get_cached_auth(cache_key)
+
+        if user_auth is None:
+            user_auth = super().authenticate_credentials(key)
+            set_cached_auth(cache_key, user_auth)
+
+        user, token = user_auth
+        return (copy(user), token)
+
+    async def aauthenticate_credentials(self, key):
+        cache_key = get_token_auth_key(key)
+        user_auth = await aget_cached_auth(cache_key)
+
+        if user_auth is None:
+            user_auth = await super().aauthenticate_credentials(key)
+            await aset_cached_auth(cache_key, user_auth)
+
+        user, token = user_auth
+        return (copy(user), token)
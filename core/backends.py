@@ -0,0 +1,28 @@
+from copy import copy
+from allauth.account.auth_backends import AuthenticationBackend
+from django.contrib.auth.backends import ModelBackend
+from core.cache import get_cached_auth, get_user_auth_key, set_cached_auth
+
+
+class CachedUserBackendMixin:
+    # Caches the users loaded for sessions, invalidated like the token cache of
+    # `CachedTokenAuthentication`.
+    def get_user(self, user_id):
+        cache_key = get_user_auth_key(user_id)
+        user = get_cached_auth(cache_key)
+
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            set_cached_auth(cache_key, user)
+
+        return copy(user)
+
+
+class CachedModelBackend(CachedUserBackendMixin, ModelBackend):
+    pass
+
+
+class CachedAuthenticationBackend(CachedUserBackendMixin, AuthenticationBackend):
+    pass
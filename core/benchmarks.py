@@ -0,0 +1,176 @@
+import platform
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+import django
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core import seeding
+from core.models import HydroponicSystem, User
+
+READING_INTERVAL = timedelta(minutes=5)
+
+
+class Case:
+    # A benchmarked request. `get_request` returns the id of the user sending
+    # the next request and its method, URL and data, chosen with the given
+    # random number generator.
+    def __init__(self, name, get_request):
+        self.name = name
+        self.get_request = get_request
+
+
+def get_cases(systems):
+    def random_system(rng):
+        return rng.choice(systems)
+
+    def retrieve(rng):
+        system = random_system(rng)
+        url = reverse("hydroponic-system-detail", kwargs={"pk": system.pk})
+        return system.owner_id, "get", url, None
+
+    def list_readings(rng):
+        system = random_system(rng)
+        return system.owner_id, "get", reverse("sensor-reading-list"), None
+
+    def list_readings_by_cursor(rng):
+        system = random_system(rng)
+        data = {"pagination": "cursor", "hydroponic_system": system.pk}
+        return system.owner_id, "get", reverse("sensor-reading-list"), data
+
+    def create_reading(rng):
+        system = random_system(rng)
+        data = {
+            "ph": str(Decimal(rng.randint(550, 700)).scaleb(-2)),
+            "water_temp": str(Decimal(rng.randint(1800, 2400)).scaleb(-2)),
+            "tds": str(Decimal(rng.randint(60000, 90000)).scaleb(-2)),
+            "hydroponic_system": system.pk,
+        }
+        return system.owner_id, "post", reverse("sensor-reading-list"), data
+
+    def aggregate_readings(rng):
+        system = random_system(rng)
+        data = {"bucket": "1h", "hydroponic_system": system.pk}
+        return system.owner_id, "get", reverse("sensor-reading-aggregate"), data
+
+    return [
+        Case("HydroponicSystemViewSet.retrieve", retrieve),
+        Case("SensorReadingViewSet.list", list_readings),
+        Case("SensorReadingViewSet.list.cursor", list_readings_by_cursor),
+        Case("SensorReadingViewSet.create", create_reading),
+        Case("SensorReadingViewSet.aggregate", aggregate_readings),
+    ]
+
+
+def seed(users, systems_per_user, readings_per_system, seed_value):
+    seeding.seed(
+        users,
+        systems_per_user,
+        readings_per_system,
+        READING_INTERVAL,
+        timezone.now(),
+        seed_value,
+    )
+    owners = User.objects.filter(username__startswith=f"seed{seed_value}_")
+    Token.objects.bulk_create(
+        Token(user=owner, key=Token.generate_key()) for owner in owners
+    )
+    return list(HydroponicSystem.objects.filter(owner__in=owners).order_by("id"))
+
+
+def percentile(values, percent):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def run_case(case, tokens, requests, warmup, rng):
+    client = APIClient()
+    latencies = []
+    query_counts = []
+    start = time.perf_counter()
+
+    for i in range(warmup + requests):
+        owner_id, method, url, data = case.get_request(rng)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {tokens[owner_id]}")
+
+        with CaptureQueriesContext(connection) as queries:
+            request_start = time.perf_counter()
+            response = getattr(client, method)(url, data=data, format="json")
+            latency = time.perf_counter() - request_start
+
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"{case.name} responded with {response.status_code}: "
+                f"{response.content[:200]!r}"
+            )
+
+        if i == warmup - 1:
+            start = time.perf_counter()
+        if i >= warmup:
+            latencies.append(latency * 1000)
+            query_counts.append(len(queries))
+
+    duration = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "throughput": round(requests / duration, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 3),
+            "p50": round(percentile(latencies, 50), 3),
+            "p90": round(percentile(latencies, 90), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+        "queries": {
+            "mean": round(statistics.fmean(query_counts), 2),
+            "max": max(query_counts),
+        },
+    }
+
+
+def run_benchmarks(
+    users, systems_per_user, readings_per_system, requests, warmup, seed_value, cases
+):
+    # Runs on the current database, which should be a disposable one. It is
+    # flushed first, so that runs on a kept database start from the same data
+    # instead of failing to seed the same users again. The cases run in the
+    # same order and with the same random requests for the same seed.
+    call_command("flush", interactive=False, verbosity=0)
+    systems = seed(users, systems_per_user, readings_per_system, seed_value)
+    tokens = dict(Token.objects.values_list("user_id", "key"))
+
+    results = {}
+    for case in get_cases(systems):
+        if cases and case.name not in cases:
+            continue
+        for cache in caches.all():
+            cache.clear()
+        case_rng = random.Random(f"{seed_value}:{case.name}")
+        results[case.name] = run_case(case, tokens, requests, warmup, case_rng)
+
+    return {
+        "parameters": {
+            "users": users,
+            "systems_per_user": systems_per_user,
+            "readings_per_system": readings_per_system,
+            "requests": requests,
+            "warmup": warmup,
+            "seed": seed_value,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "database_version": connection.pg_version,
+        },
+        "results": results,
+    }
@@ -0,0 +1,139 @@
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, close_old_connections, connection
+from django.dispatch import receiver
+from core.models import SensorReading
+
+logger = logging.getLogger(__name__)
+
+
+class SensorReadingBuffer:
+    # Collects sensor readings accepted by the API and inserts them in batches
+    # from a background thread, when `flush_size` readings are waiting or
+    # `flush_interval` seconds have passed. Readings that are still in the buffer
+    # are lost if the process is killed, but they are flushed when it exits.
+    def __init__(self, max_size, flush_size, flush_interval, block_timeout):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.readings = []
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def add(self, reading):
+        # Returns False if the buffer stays full for `block_timeout` seconds.
+        # Once the buffer is closed, e.g. while the process is exiting, the
+        # reading is inserted right away instead of being lost.
+        deadline = time.monotonic() + self.block_timeout
+
+        with self.condition:
+            if not self.closed and self.thread is None:
+                self.start()
+
+            while not self.closed and len(self.readings) >= self.max_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return False
+                self.condition.wait(timeout)
+
+            if not self.closed:
+                self.readings.append(reading)
+                if len(self.readings) >= self.flush_size:
+                    self.condition.notify_all()
+                return True
+
+        SensorReading.objects.ingest([reading])
+        return True
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name="sensor-reading-buffer", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        while True:
+            with self.condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self.closed and len(self.readings) < self.flush_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self.condition.wait(timeout)
+                closed = self.closed
+
+            close_old_connections()
+            self.flush()
+            if closed:
+                break
+
+        connection.close()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.condition:
+                readings, self.readings = self.readings, []
+                self.condition.notify_all()
+
+            if not readings:
+                return
+
+            try:
+                SensorReading.objects.ingest(readings)
+            except DatabaseError:
+                # One invalid reading, e.g. of a deleted hydroponic system, must
+                # not make the whole batch fail.
+                logger.exception("Failed to flush sensor readings, retrying one by one")
+                for reading in readings:
+                    reading.pk = None
+                    try:
+                        SensorReading.objects.ingest([reading])
+                    except DatabaseError:
+                        logger.exception("Dropped sensor reading %r", reading)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        else:
+            self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = SensorReadingBuffer(
+                max_size=settings.SENSOR_READING_BUFFER_MAX_SIZE,
+                flush_size=settings.SENSOR_READING_BUFFER_FLUSH_SIZE,
+                flush_interval=settings.SENSOR_READING_BUFFER_FLUSH_INTERVAL,
+                block_timeout=settings.SENSOR_READING_BUFFER_BLOCK_TIMEOUT,
+            )
+        return _buffer
+
+
+@receiver(setting_changed)
+def reset_buffer(setting, **kwargs):
+    global _buffer
+
+    if setting.startswith("SENSOR_READING_BUFFER"):
+        with _buffer_lock:
+            if _buffer is not None:
+                _buffer.close()
+            _buffer = None
@@ -0,0 +1,219 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class LocalCache:
+    # A thread-safe LRU cache of at most `max_size` entries, each of which
+    # expires `timeout` seconds after it was set.
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires, value = self.entries[key]
+            except KeyError:
+                return default
+
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return default
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def get_owner_version_key(owner_id):
+    return f"hydroponics:owner-version:{owner_id}"
+
+
+def new_owner_version():
+    # Versions are unique tokens instead of counters, so that a version lost
+    # to an eviction or a restart of the cache is never issued again and old
+    # responses and `ETag`s never become valid again.
+    return uuid4().hex
+
+
+def get_owner_version(owner_id):
+    cache = get_cache()
+    key = get_owner_version_key(owner_id)
+    version = cache.get(key)
+
+    if version is None:
+        version = new_owner_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+
+    return version
+
+
+def bump_owner_versions(owner_ids):
+    # Responses cached for the owners are not deleted, they just stop being
+    # looked up and expire.
+    get_cache().set_many(
+        {
+            get_owner_version_key(owner_id): new_owner_version()
+            for owner_id in set(owner_ids)
+        },
+        timeout=None,
+    )
+
+
+def get_primary_pin_key(owner_id):
+    return f"hydroponics:primary-pin:{owner_id}"
+
+
+def pin_owners_to_primary(owner_ids):
+    # The owners read from the primary database until the pins expire, so they
+    # see their writes even if the replicas lag behind.
+    timeout = settings.DATABASE_REPLICA_PIN_SECONDS
+    if not settings.DATABASE_REPLICAS or not timeout:
+        return
+    get_cache().set_many(
+        {get_primary_pin_key(owner_id): True for owner_id in set(owner_ids)}, timeout
+    )
+
+
+def is_pinned_to_primary(owner_id):
+    return get_cache().get(get_primary_pin_key(owner_id), False)
+
+
+async def ais_pinned_to_primary(owner_id):
+    return await get_cache().aget(get_primary_pin_key(owner_id), False)
+
+
+def get_response_cache_key(request, owner_id, version, action):
+    query_params = sorted(
+        (name, sorted(values)) for name, values in request.query_params.lists()
+    )
+    parts = [
+        owner_id,
+        version,
+        action,
+        request.get_host(),
+        request.path,
+        query_params,
+        request.accepted_media_type,
+    ]
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f"hydroponics:response:{digest}"
+
+
+_auth_cache = None
+
+
+def get_auth_cache():
+    global _auth_cache
+
+    if _auth_cache is None:
+        _auth_cache = LocalCache(
+            settings.AUTH_CACHE_MAX_SIZE, settings.AUTH_CACHE_LOCAL_TIMEOUT
+        )
+    return _auth_cache
+
+
+def get_shared_auth_cache():
+    if settings.AUTH_CACHE_ALIAS is None:
+        return None
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+@receiver(setting_changed)
+def reset_auth_cache(setting, **kwargs):
+    global _auth_cache
+
+    if setting.startswith("AUTH_CACHE"):
+        _auth_cache = None
+
+
+def get_token_auth_key(key):
+    return f"hydroponics:auth:token:{key}"
+
+
+def get_user_auth_key(user_id):
+    return f"hydroponics:auth:user:{user_id}"
+
+
+def get_cached_auth(key):
+    local_cache = get_auth_cache()
+    value = local_cache.get(key)
+
+    if value is None:
+        shared_cache = get_shared_auth_cache()
+        if shared_cache is not None:
+            value = shared_cache.get(key)
+            if value is not None:
+                local_cache.set(key, value)
+
+    return value
+
+
+async def aget_cached_auth(key):
+    local_cache = get_auth_cache()
+    value = local_cache.get(key)
+
+    if value is None:
+        shared_cache = get_shared_auth_cache()
+        if shared_cache is not None:
+            value = await shared_cache.aget(key)
+            if value is not None:
+                local_cache.set(key, value)
+
+    return value
+
+
+def set_cached_auth(key, value):
+    get_auth_cache().set(key, value)
+
+    shared_cache = get_shared_auth_cache()
+    if shared_cache is not None:
+        shared_cache.set(key, value, settings.AUTH_CACHE_TIMEOUT)
+
+
+async def aset_cached_auth(key, value):
+    get_auth_cache().set(key, value)
+
+    shared_cache = get_shared_auth_cache()
+    if shared_cache is not None:
+        await shared_cache.aset(key, value, settings.AUTH_CACHE_TIMEOUT)
+
+
+def delete_cached_auth(keys):
+    # Only the local cache of the current process is cleared, the ones of the
+    # other processes expire after `AUTH_CACHE_LOCAL_TIMEOUT` seconds.
+    local_cache = get_auth_cache()
+    for key in keys:
+        local_cache.delete(key)
+
+    shared_cache = get_shared_auth_cache()
+    if shared_cache is not None:
+        shared_cache.delete_many(keys)
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_response_cache(app_configs, **kwargs):
+    # The owner versions invalidating the cached responses have to be seen by
+    # every process serving the API.
+    alias = settings.RESPONSE_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend == "django.core.cache.backends.locmem.LocMemCache":
+        return [
+            Warning(
+                f"The {alias!r} cache used for responses is local to every process.",
+                hint=(
+                    "Processes serving the API can return stale responses after "
+                    "writes handled by other processes. Set RESPONSE_CACHE_ALIAS "
+                    "to a cache shared by all the processes, e.g. Redis or "
+                    "Memcached, unless the API is served by a single process."
+                ),
+                id="core.W001",
+            )
+        ]
+    return []
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    # Sessions deleted on logout have to be deleted from the cache of every
+    # process, or the other processes keep accepting them.
+    if settings.SESSION_ENGINE not in (
+        "django.contrib.sessions.backends.cache",
+        "django.contrib.sessions.backends.cached_db",
+    ):
+        return []
+
+    alias = settings.SESSION_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend == "django.core.cache.backends.locmem.LocMemCache":
+        return [
+            Error(
+                f"The {alias!r} cache used for sessions is local to every process.",
+                hint=(
+                    "Sessions deleted on logout would stay valid in the other "
+                    "processes. Set SESSION_CACHE_ALIAS to a cache shared by all "
+                    "the processes, e.g. Redis or Memcached, or use the db "
+                    "session engine."
+                ),
+                id="core.E002",
+            )
+        ]
+    return []
@@ -0,0 +1,115 @@
+import threading
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from psycopg import IsolationLevel
+from core.db.creation import DatabaseCreation
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # The PostgreSQL backend with the connection pooling of Django 5.1, enabled
+    # with `OPTIONS["pool"]` set to True or to the arguments of psycopg's
+    # `ConnectionPool`, e.g. `min_size`, `max_size` and `timeout`. Closing a
+    # connection returns it to the pool of the process. With CONN_HEALTH_CHECKS
+    # the pool checks connections before handing them out.
+    creation_class = DatabaseCreation
+
+    _connection_pools = {}
+    _connection_pools_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict["OPTIONS"].get("pool")
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+
+        if self.alias not in self._connection_pools:
+            if self.settings_dict["CONN_MAX_AGE"] != 0:
+                raise ImproperlyConfigured(
+                    "Pooling doesn't support persistent connections."
+                )
+            if pool_options is True:
+                pool_options = {}
+
+            try:
+                from psycopg_pool import ConnectionPool
+            except ImportError as err:
+                raise ImproperlyConfigured(
+                    "Error loading psycopg_pool module.\nDid you install psycopg-pool?"
+                ) from err
+
+            connect_kwargs = self.get_connection_params()
+            # Django sets the autocommit mode after taking the connection.
+            connect_kwargs["autocommit"] = True
+            check = None
+            if self.settings_dict["CONN_HEALTH_CHECKS"]:
+                check = ConnectionPool.check_connection
+
+            with self._connection_pools_lock:
+                if self.alias not in self._connection_pools:
+                    self._connection_pools[self.alias] = ConnectionPool(
+                        kwargs=connect_kwargs,
+                        open=False,
+                        check=check,
+                        **{"name": self.alias, **pool_options},
+                    )
+
+        return self._connection_pools[self.alias]
+
+    def close_pool(self):
+        with self._connection_pools_lock:
+            pool = self._connection_pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
+
+    def get_pool_stats(self):
+        # The counters of the pool of this process, see
+        # https://www.psycopg.org/psycopg3/docs/advanced/pool.html#pool-stats
+        pool = self._connection_pools.get(self.alias)
+        if pool is None:
+            return None
+        return pool.get_stats()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = IsolationLevel.READ_COMMITTED
+        if "isolation_level" in options:
+            try:
+                self.isolation_level = IsolationLevel(options["isolation_level"])
+            except ValueError:
+                raise ImproperlyConfigured(
+                    f"Invalid transaction isolation level "
+                    f"{options['isolation_level']} specified. Use one of the "
+                    f"psycopg.IsolationLevel values."
+                )
+
+        # Opens the pool on first use rather than at startup.
+        pool.open()
+        connection = pool.getconn()
+        if "isolation_level" in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            # The connection is returned to the pool it was taken from, which
+            # is not the current one if the pool was closed in the meantime.
+            self.connection._pool.putconn(self.connection)
+            self.connection = None
+
+    def close_if_health_check_failed(self):
+        # The pool only hands out healthy connections.
+        if self.pool is None:
+            super().close_if_health_check_failed()
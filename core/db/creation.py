@@ -0,0 +1,15 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # The pool connects to the database named in the settings when it is
+    # created, so it is closed whenever the test database name changes.
+    def create_test_db(self, *args, **kwargs):
+        self.connection.close()
+        self.connection.close_pool()
+        return super().create_test_db(*args, **kwargs)
+
+    def destroy_test_db(self, *args, **kwargs):
+        self.connection.close()
+        self.connection.close_pool()
+        return super().destroy_test_db(*args, **kwargs)
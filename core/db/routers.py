@@ -0,0 +1,44 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from core.cache import ais_pinned_to_primary, is_pinned_to_primary
+
+# The database read by the current request, or None for the primary.
+read_database = ContextVar("read_database", default=None)
+
+
+class ReplicaRouter:
+    # Sends reads to the database chosen for the current request, e.g. by
+    # `ReplicaReadMixin`, and writes always to the primary.
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas contain the same data as the primary.
+        return True
+
+
+def get_replica(owner_id):
+    # Returns a replica for a user that is not pinned to the primary, or None.
+    if not settings.DATABASE_REPLICAS or is_pinned_to_primary(owner_id):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+async def aget_replica(owner_id):
+    if not settings.DATABASE_REPLICAS or await ais_pinned_to_primary(owner_id):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def reads_from(alias):
+    token = read_database.set(alias)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
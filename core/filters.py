@@ -1,5 +1,5 @@
 import django_filters as filters
-from core.models import HydroponicSystem, SensorReading
+from core.models import Alert, AlertRule, HydroponicSystem, SensorReading
 
 
 class HydroponicSystemFilter(filters.FilterSet):
@@ -9,6 +9,8 @@ class HydroponicSystemFilter(filters.FilterSet):
             "name": ["exact"],
             "plant_count": ["exact", "gte", "lte"],
             "created_at": ["exact", "gte", "lte"],
+            "reading_count": ["exact", "gte", "lte"],
+            "last_reading_at": ["gte", "lte", "isnull"],
         }
 
 
@@ -22,3 +24,30 @@ class SensorReadingFilter(filters.FilterSet):
             "hydroponic_system": ["exact"],
             "created_at": ["exact", "gte", "lte"],
         }
+
+
+class AsyncSensorReadingFilter(SensorReadingFilter):
+    # Async views cannot look the hydroponic system up while validating the
+    # filters, so it is filtered by id.
+    hydroponic_system = filters.NumberFilter()
+
+
+class AlertRuleFilter(filters.FilterSet):
+    class Meta:
+        model = AlertRule
+        fields = {
+            "hydroponic_system": ["exact"],
+            "metric": ["exact"],
+        }
+
+
+class AlertFilter(filters.FilterSet):
+    class Meta:
+        model = Alert
+        fields = {
+            "rule": ["exact"],
+            "hydroponic_system": ["exact"],
+            "kind": ["exact"],
+            "metric": ["exact"],
+            "created_at": ["gte", "lte"],
+        }
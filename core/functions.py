@@ -0,0 +1,39 @@
+from datetime import datetime, timezone
+from django.db.models import (
+    Aggregate,
+    DateTimeField,
+    DurationField,
+    FloatField,
+    Func,
+    Value,
+)
+
+BUCKET_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def date_bin(stride, value, origin=BUCKET_ORIGIN):
+    return origin + (value - origin) // stride * stride
+
+
+class DateBin(Func):
+    function = "date_bin"
+    output_field = DateTimeField()
+
+    def __init__(self, stride, expression, origin=BUCKET_ORIGIN, **extra):
+        super().__init__(
+            Value(stride, output_field=DurationField()),
+            expression,
+            Value(origin, output_field=DateTimeField()),
+            **extra,
+        )
+
+
+class PercentileCont(Aggregate):
+    function = "percentile_cont"
+    template = "%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        if not 0 <= fraction <= 1:
+            raise ValueError("The fraction must be between 0 and 1.")
+        super().__init__(expression, fraction=float(fraction), **extra)
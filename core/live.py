@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+from decimal import Decimal
+import psycopg
+from psycopg import sql
+from django.conf import settings
+from django.db import connections
+from core.models import SensorReading
+from core.serializers import SensorReadingSerializer, ValuesSerializer
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "sensor_readings"
+# Postgres rejects notification payloads of 8000 bytes or more.
+PAYLOAD_MAX_SIZE = 7900
+RECONNECT_DELAYS = [0.5, 1, 2, 5, 10]
+
+
+def get_values_row(reading, sources):
+    # Builds the row `values()` would return for the reading, so that it is
+    # serialized exactly like in the API responses.
+    row = {}
+    for source in sources:
+        field = SensorReading._meta.get_field(source)
+        value = field.to_python(getattr(reading, field.attname))
+        if value is not None and field.get_internal_type() == "DecimalField":
+            value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+        row[source] = value
+    return row
+
+
+def encode_notifications(readings):
+    # Returns the payloads announcing the readings. Every payload is a JSON list
+    # of `[owner id, serialized reading]` pairs that fits into a notification.
+    values_serializer = ValuesSerializer.for_serializer(SensorReadingSerializer)
+    rows = [get_values_row(reading, values_serializer.sources) for reading in readings]
+    data = values_serializer.to_representation(rows)
+
+    payloads = []
+    items = []
+    size = 2
+    for reading, item in zip(readings, data):
+        item = json.dumps([reading.owner_id, item], separators=(",", ":"))
+        if items and size + len(item) + 1 > PAYLOAD_MAX_SIZE:
+            payloads.append(f"[{','.join(items)}]")
+            items = []
+            size = 2
+        items.append(item)
+        size += len(item) + 1
+    if items:
+        payloads.append(f"[{','.join(items)}]")
+
+    return payloads
+
+
+def notify(readings, using="default"):
+    # Notifications are delivered when the transaction is committed and dropped
+    # when it is rolled back.
+    payloads = encode_notifications(readings)
+    if not payloads:
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+            [CHANNEL, payloads],
+        )
+
+
+class Subscription:
+    # A queue of the serialized readings of an owner, optionally of a single
+    # hydroponic system. A subscriber that does not keep up is closed instead
+    # of making the hub buffer readings without a limit.
+    def __init__(self, owner_id, hydroponic_system_id=None, max_size=None):
+        self.owner_id = owner_id
+        self.hydroponic_system_id = hydroponic_system_id
+        self.queue = asyncio.Queue(max_size or settings.SENSOR_READING_LIVE_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, item):
+        if self.closed:
+            return
+        if self.hydroponic_system_id not in (None, item["hydroponic_system"]):
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self):
+        self.closed = True
+        # Wakes the subscriber up if it is waiting.
+        if self.queue.empty():
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout=None):
+        # Returns the next reading, or None when the subscription is closed.
+        # Raises `asyncio.TimeoutError` when there is no reading within the timeout.
+        if self.closed and self.queue.empty():
+            return None
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class SensorReadingHub:
+    # Fans the readings announced with `notify`, by this or any other process,
+    # out to the subscriptions of the owners. A single connection per process
+    # listens for the notifications, and only while there are subscribers.
+    def __init__(self, using="default"):
+        self.using = using
+        self.subscriptions = {}
+        self.listener = None
+        self.listening = asyncio.Event()
+
+    def subscribe(self, owner_id, hydroponic_system_id=None):
+        subscription = Subscription(owner_id, hydroponic_system_id)
+        self.subscriptions.setdefault(owner_id, set()).add(subscription)
+
+        if self.listener is None or self.listener.done():
+            self.listening.clear()
+            self.listener = asyncio.create_task(self.listen())
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        subscriptions = self.subscriptions.get(subscription.owner_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscriptions.pop(subscription.owner_id, None)
+
+        if not self.subscriptions and self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    def dispatch(self, payload):
+        try:
+            items = json.loads(payload)
+        except ValueError:
+            logger.warning("Invalid sensor reading notification: %r", payload)
+            return
+
+        for owner_id, item in items:
+            for subscription in list(self.subscriptions.get(owner_id, ())):
+                subscription.put(item)
+
+    def get_connection_params(self):
+        params = connections[self.using].get_connection_params()
+        # The cursor factory and the adapters are the ones of sync connections.
+        params.pop("cursor_factory", None)
+        params.pop("context", None)
+        return params
+
+    async def listen(self):
+        attempt = 0
+        while True:
+            try:
+                connection = await psycopg.AsyncConnection.connect(
+                    **self.get_connection_params(), autocommit=True
+                )
+                async with connection:
+                    await connection.execute(
+                        sql.SQL("LISTEN {}").format(sql.Identifier(CHANNEL))
+                    )
+                    self.listening.set()
+                    attempt = 0
+                    async for notification in connection.notifies():
+                        self.dispatch(notification.payload)
+            except psycopg.Error:
+                # Readings created while reconnecting are not pushed, so the
+                # subscribers are closed to make the clients catch up.
+                logger.exception("Listening for sensor readings failed.")
+                self.listening.clear()
+                for subscriptions in self.subscriptions.values():
+                    for subscription in subscriptions:
+                        subscription.close()
+
+            await asyncio.sleep(
+                RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+            )
+            attempt += 1
+
+
+_hubs = {}
+
+
+def get_hub():
+    # Every event loop needs its own hub, since the queues and the listening
+    # connection belong to the loop.
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        for other_loop in list(_hubs):
+            if other_loop.is_closed():
+                del _hubs[other_loop]
+        hub = _hubs[loop] = SensorReadingHub()
+    return hub
@@ -0,0 +1,75 @@
+import json
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from core.benchmarks import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a test database and measures the throughput, latency and query "
+        "counts of the API hot paths. Prints the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--systems-per-user", type=int, default=5)
+        parser.add_argument("--readings-per-system", type=int, default=1000)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of measured requests per case.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Number of requests per case sent before measuring.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--case",
+            action="append",
+            dest="cases",
+            help="Name of a case to run, e.g. SensorReadingViewSet.list. Can be "
+            "repeated. All the cases are run by default.",
+        )
+        parser.add_argument("--output", help="File to write the results to.")
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database, like the test command does.",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity, interactive=False, keepdb=options["keepdb"]
+        )
+
+        try:
+            results = run_benchmarks(
+                options["users"],
+                options["systems_per_user"],
+                options["readings_per_system"],
+                options["requests"],
+                options["warmup"],
+                options["seed"],
+                options["cases"],
+            )
+        finally:
+            teardown_databases(old_config, verbosity, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
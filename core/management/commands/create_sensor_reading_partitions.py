@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core import partitions
+from core.models import SensorReading
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the partitions of the sensor reading table for the current and "
+        "the upcoming time ranges."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Number of partitions to create after the current one.",
+        )
+        parser.add_argument(
+            "--since",
+            help=(
+                "Also create the partitions starting from the given ISO 8601 "
+                "datetime, e.g. 2024-06-01T00:00:00Z. Readings of these partitions "
+                "are moved from the default partition."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        interval = partitions.get_interval()
+        start = timezone.now()
+
+        if options["since"] is not None:
+            start = parse_datetime(options["since"])
+            if start is None or start.tzinfo is None:
+                raise CommandError(
+                    "--since must be an ISO 8601 datetime with a timezone."
+                )
+
+        end = partitions.floor_partition(timezone.now(), interval)
+        for _ in range(options["ahead"]):
+            end = partitions.next_partition(end, interval)
+
+        table = SensorReading._meta.db_table
+        created = partitions.create_partitions(table, start, end, interval)
+
+        for partition in created:
+            self.stdout.write(
+                f"Created partition {partition.name} for readings from "
+                f"{partition.start.isoformat()} to {partition.end.isoformat()}."
+            )
+        if not created:
+            self.stdout.write("All partitions already exist.")
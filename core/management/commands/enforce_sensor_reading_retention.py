@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from core.retention import enforce_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes sensor readings and hourly rollups older than allowed by the "
+        "retention policies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Maximum number of rows deleted in a single transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Number of seconds to wait between batches.",
+        )
+
+    def handle(self, *args, **options):
+        result = enforce_retention(options["batch_size"], options["sleep"])
+
+        for partition in result["dropped_partitions"]:
+            self.stdout.write(f"Dropped partition {partition.name}.")
+        self.stdout.write(f"Deleted {result['deleted_readings']} sensor readings.")
+        self.stdout.write(
+            f"Deleted {result['deleted_hourly_rollups']} hourly sensor reading rollups."
+        )
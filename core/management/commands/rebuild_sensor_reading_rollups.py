@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from core.models import DailySensorReadingRollup, HourlySensorReadingRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the hourly and daily sensor reading rollups from the readings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help=(
+                "Only rebuild the rollups of the periods starting at or after the "
+                "given ISO 8601 datetime, e.g. 2024-06-01T00:00:00Z."
+            ),
+        )
+        parser.add_argument(
+            "--until",
+            help=(
+                "Only rebuild the rollups of the periods starting before the given "
+                "ISO 8601 datetime."
+            ),
+        )
+        parser.add_argument(
+            "--batch-days",
+            type=int,
+            default=1,
+            help="Number of days of rollups rebuilt per transaction.",
+        )
+
+    def parse_datetime(self, options, name):
+        value = options[name]
+        if value is None:
+            return None
+        value = parse_datetime(value)
+        if value is None or value.tzinfo is None:
+            raise CommandError(
+                f"--{name} must be an ISO 8601 datetime with a timezone."
+            )
+        return value
+
+    def handle(self, *args, **options):
+        since = self.parse_datetime(options, "since")
+        until = self.parse_datetime(options, "until")
+        if options["batch_days"] < 1:
+            raise CommandError("--batch-days must be at least 1.")
+        batch = timedelta(days=options["batch_days"])
+
+        for model in (HourlySensorReadingRollup, DailySensorReadingRollup):
+            model.objects.rebuild(since=since, until=until, batch=batch)
+            self.stdout.write(f"Rebuilt {model._meta.verbose_name_plural}.")
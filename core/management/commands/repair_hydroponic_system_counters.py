@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from core.models import HydroponicSystem
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the reading counters and the last readings of the hydroponic "
+        "systems from their readings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--system",
+            type=int,
+            action="append",
+            dest="systems",
+            help="Only repair the hydroponic system with the given id. Repeatable.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of hydroponic systems repaired and locked per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        qs = HydroponicSystem.objects.order_by("pk")
+        if options["systems"]:
+            qs = qs.filter(pk__in=options["systems"])
+        pks = list(qs.values_list("pk", flat=True))
+
+        batch_size = options["batch_size"]
+        repaired = 0
+        for i in range(0, len(pks), batch_size):
+            batch = pks[i : i + batch_size]
+            repaired += HydroponicSystem.objects.filter(
+                pk__in=batch
+            ).repair_sensor_reading_counters()
+
+        self.stdout.write(f"Repaired the counters of {repaired} hydroponic systems.")
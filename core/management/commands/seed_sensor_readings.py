@@ -0,0 +1,78 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates users, hydroponic systems and realistic sensor reading time "
+        "series, streaming the readings into the database with COPY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--systems-per-user", type=int, default=5)
+        parser.add_argument("--readings-per-system", type=int, default=10000)
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=300,
+            help="Number of seconds between the readings of a system.",
+        )
+        parser.add_argument(
+            "--end",
+            help="ISO 8601 datetime of the last readings, e.g. "
+            "2024-06-01T00:00:00Z. Defaults to now.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the generated data. The same seed and parameters "
+            "always generate the same readings.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100000,
+            help="Maximum number of readings copied by a single statement.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes copying the readings in parallel.",
+        )
+        parser.add_argument(
+            "--skip-rollups",
+            action="store_true",
+            help="Do not rebuild the rollups of the seeded time range.",
+        )
+
+    def handle(self, *args, **options):
+        end = timezone.now()
+        if options["end"] is not None:
+            end = parse_datetime(options["end"])
+            if end is None or end.tzinfo is None:
+                raise CommandError(
+                    "--end must be an ISO 8601 datetime with a timezone."
+                )
+
+        result = seed(
+            options["users"],
+            options["systems_per_user"],
+            options["readings_per_system"],
+            timedelta(seconds=options["interval"]),
+            end,
+            options["seed"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            rollups=not options["skip_rollups"],
+        )
+
+        self.stdout.write(
+            f"Created {result['users']} users, {result['systems']} hydroponic "
+            f"systems and {result['readings']} sensor readings."
+        )
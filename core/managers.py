@@ -1,5 +1,31 @@
-from django.db import models
-from django.db.models import Prefetch
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from operator import itemgetter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Prefetch,
+    Q,
+    StdDev,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, JSONObject
+from django.utils import timezone
+from core.cache import bump_owner_versions
+from core.functions import BUCKET_ORIGIN, DateBin, PercentileCont, date_bin
+from core.signals import sensor_readings_created
 
 
 class HydroponicSystemQuerySet(models.QuerySet):
@@ -11,5 +37,370 @@ class HydroponicSystemQuerySet(models.QuerySet):
             Prefetch("sensor_readings", queryset=qs, to_attr="recent_sensor_readings")
         )
 
+    def annotate_sensor_reading_summary(self):
+        # Annotates every system with its latest reading, as a JSON object with
+        # the decimals as strings to keep their scale, and with the number of
+        # its readings. The latest reading is an index lookup per system.
+        from core.models import SensorReading
+
+        readings = SensorReading.objects.filter(hydroponic_system=OuterRef("pk"))
+        latest = readings.order_by("-created_at").values(
+            json=JSONObject(
+                id="id",
+                ph=Cast("ph", models.TextField()),
+                water_temp=Cast("water_temp", models.TextField()),
+                tds=Cast("tds", models.TextField()),
+                hydroponic_system="hydroponic_system_id",
+                created_at="created_at",
+            )
+        )[:1]
+
+        return self.annotate(
+            latest_sensor_reading=Subquery(latest, output_field=models.JSONField()),
+            sensor_reading_count=F("reading_count"),
+        )
+
+    def record_sensor_readings(self, readings):
+        # Adds the readings to the counters and replaces the last values of the
+        # systems with the latest of the readings, unless a later reading has
+        # already been recorded. A single statement updates all the systems, so
+        # the counters are consistent with the readings committed alongside.
+        from core.models import SensorReading
+
+        created_at_field = SensorReading._meta.get_field("created_at")
+        summaries = {}
+        for reading in readings:
+            created_at = created_at_field.to_python(reading.created_at)
+            summary = summaries.setdefault(
+                reading.hydroponic_system_id,
+                {"count": 0, "created_at": created_at, "reading": reading},
+            )
+            summary["count"] += 1
+            if created_at > summary["created_at"]:
+                summary["created_at"] = created_at
+                summary["reading"] = reading
+
+        if not summaries:
+            return 0
+
+        def case(name, get_value, is_newer=False):
+            field = self.model._meta.get_field(name)
+            whens = []
+            for pk, summary in sorted(summaries.items()):
+                condition = Q(pk=pk)
+                if is_newer:
+                    condition &= Q(last_reading_at__isnull=True) | Q(
+                        last_reading_at__lt=summary["created_at"]
+                    )
+                value = field.to_python(get_value(summary))
+                whens.append(When(condition, then=Value(value)))
+            return Case(
+                *whens,
+                default=F(name) if is_newer else Value(0),
+                output_field=field,
+            )
+
+        updates = {
+            "reading_count": F("reading_count")
+            + case("reading_count", itemgetter("count")),
+            "last_reading_at": case(
+                "last_reading_at", itemgetter("created_at"), is_newer=True
+            ),
+        }
+        for metric in SensorReading.METRICS:
+            updates[f"last_{metric}"] = case(
+                f"last_{metric}",
+                lambda summary: getattr(summary["reading"], metric),
+                is_newer=True,
+            )
+
+        return self.filter(pk__in=summaries).update(**updates)
+
+    def repair_sensor_reading_counters(self):
+        # Recomputes the counters from the stored readings. The systems are
+        # locked first, so that readings ingested concurrently are either
+        # counted here or added once the repair is committed.
+        from core.models import SensorReading
+
+        readings = SensorReading.objects.filter(hydroponic_system=OuterRef("pk"))
+        latest = readings.order_by("-created_at")
+        count = (
+            readings.order_by()
+            .values("hydroponic_system")
+            .annotate(count=Count("*"))
+            .values("count")
+        )
+        updates = {
+            "reading_count": Coalesce(Subquery(count), 0),
+            "last_reading_at": Subquery(latest.values("created_at")[:1]),
+        }
+        for metric in SensorReading.METRICS:
+            updates[f"last_{metric}"] = Subquery(latest.values(metric)[:1])
+
+        with transaction.atomic(using=self.db):
+            systems = list(
+                self.order_by("pk").select_for_update().values_list("pk", "owner_id")
+            )
+            repaired = self.filter(pk__in=[pk for pk, _ in systems]).update(**updates)
+            # The cached responses show the counters.
+            owner_ids = {owner_id for _, owner_id in systems}
+            transaction.on_commit(lambda: bump_owner_versions(owner_ids), using=self.db)
+            return repaired
+
+
+class SensorReadingQuerySet(models.QuerySet):
+    def ingest(self, readings, batch_size=None):
+        for reading in readings:
+            if reading.owner_id is None:
+                reading.owner_id = reading.hydroponic_system.owner_id
+
+        with transaction.atomic(using=self.db):
+            readings = self.bulk_create(readings, batch_size=batch_size)
+            sensor_readings_created.send(sender=self.model, readings=readings)
+
+        return readings
+
+    async def aingest(self, readings, batch_size=None):
+        return await sync_to_async(self.ingest)(readings, batch_size=batch_size)
+
+    def aggregate_buckets(self, stride):
+        aggregates = {"count": Count("id")}
+        for metric in self.model.METRICS:
+            aggregates[f"{metric}_sum"] = Sum(metric)
+            aggregates[f"{metric}_min"] = Min(metric)
+            aggregates[f"{metric}_max"] = Max(metric)
+
+        return (
+            self.annotate(bucket=DateBin(stride, "created_at"))
+            .order_by()
+            .values("hydroponic_system", "bucket")
+            .annotate(**aggregates)
+        )
+
+    def stats(self, target_ranges, percentiles=(5, 50, 95)):
+        # Computes the statistics of all the metrics in a single query. The time
+        # in range is the fraction of the readings within the target range.
+        aggregates = {"count": Count("id")}
+        for metric in self.model.METRICS:
+            low, high = target_ranges[metric]
+            aggregates[f"{metric}_mean"] = Avg(metric)
+            aggregates[f"{metric}_stddev"] = StdDev(metric, sample=True)
+            for percentile in percentiles:
+                aggregates[f"{metric}_p{percentile}"] = PercentileCont(
+                    metric, percentile / 100
+                )
+            aggregates[f"{metric}_in_range"] = Count(
+                "id", filter=Q(**{f"{metric}__gte": low, f"{metric}__lte": high})
+            )
+
+        stats = self.order_by().aggregate(**aggregates)
+        for metric in self.model.METRICS:
+            in_range = stats.pop(f"{metric}_in_range")
+            stats[f"{metric}_time_in_range"] = (
+                in_range / stats["count"] if stats["count"] else None
+            )
+        return stats
+
+
+class SensorReadingRollupQuerySet(models.QuerySet):
+    def record(self, readings):
+        from core.models import SensorReading
+
+        period = self.model.period
+        created_at_field = SensorReading._meta.get_field("created_at")
+        rollups = defaultdict(lambda: {"count": 0})
+
+        for reading in readings:
+            created_at = created_at_field.to_python(reading.created_at)
+            key = (reading.hydroponic_system_id, date_bin(period, created_at))
+            rollup = rollups[key]
+            rollup["count"] += 1
+
+            for metric in SensorReading.METRICS:
+                value = Decimal(getattr(reading, metric))
+                if rollup["count"] == 1:
+                    rollup[f"{metric}_sum"] = value
+                    rollup[f"{metric}_min"] = value
+                    rollup[f"{metric}_max"] = value
+                else:
+                    rollup[f"{metric}_sum"] += value
+                    rollup[f"{metric}_min"] = min(rollup[f"{metric}_min"], value)
+                    rollup[f"{metric}_max"] = max(rollup[f"{metric}_max"], value)
+
+        if not rollups:
+            return
+
+        table = self.model._meta.db_table
+        columns = ["hydroponic_system_id", "period_start", "count"]
+        updates = ["count = {table}.count + EXCLUDED.count"]
+        for metric in SensorReading.METRICS:
+            columns += [f"{metric}_sum", f"{metric}_min", f"{metric}_max"]
+            updates += [
+                f"{metric}_sum = {{table}}.{metric}_sum + EXCLUDED.{metric}_sum",
+                f"{metric}_min = LEAST({{table}}.{metric}_min, EXCLUDED.{metric}_min)",
+                f"{metric}_max = GREATEST({{table}}.{metric}_max, EXCLUDED.{metric}_max)",
+            ]
+
+        params = []
+        # Sorting the rows makes concurrent upserts lock them in the same order.
+        for key in sorted(rollups):
+            rollup = rollups[key]
+            params += [*key, *(rollup[column] for column in columns[2:])]
+
+        placeholders = "({})".format(", ".join(["%s"] * len(columns)))
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES {', '.join([placeholders] * len(rollups))} "
+            f"ON CONFLICT (hydroponic_system_id, period_start) DO UPDATE SET "
+            f"{', '.join(updates).format(table=table)}"
+        )
+
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def rebuild(self, since=None, until=None, batch=timedelta(days=1)):
+        # Rebuilds the rollups of the periods starting at or after `since` and
+        # before `until`, by default of all the periods with readings. Every
+        # `batch` of periods is rebuilt in a separate transaction, so that
+        # ingestion waits only for a single batch.
+        from core.models import SensorReading
+        from core.retention import get_cutoffs, get_retention_days
+
+        period = self.model.period
+        if batch % period:
+            raise ValueError("The batch must be a multiple of the period.")
+
+        if since is None or until is None:
+            readings = SensorReading.objects.using(self.db)
+            if since is not None:
+                readings = readings.filter(created_at__gte=since)
+            if until is not None:
+                readings = readings.filter(created_at__lt=until)
+            bounds = readings.aggregate(first=Min("created_at"), last=Max("created_at"))
+            if bounds["first"] is None:
+                return
+            since = since or bounds["first"]
+            until = until or bounds["last"] + period
+
+        start = date_bin(period, since)
+        end = date_bin(period, until)
+        if end < until:
+            end += period
+
+        # The rollups are all that is left of expired readings, so only the
+        # periods of the systems that start after their raw retention cutoff
+        # are rebuilt.
+        retention_days = get_retention_days(
+            "raw_retention_days", settings.SENSOR_READING_RAW_RETENTION_DAYS
+        )
+        retained_since = {}
+        for cutoff, pks in get_cutoffs(retention_days, timezone.now()).items():
+            first = date_bin(period, cutoff)
+            if first < cutoff:
+                first += period
+            retained_since.setdefault(first, []).extend(pks)
+
+        while start < end:
+            self.rebuild_range(start, min(start + batch, end), retained_since)
+            start += batch
+
+    def rebuild_range(self, start, end, retained_since=None):
+        # `retained_since` maps the start of the first period to rebuild to the
+        # ids of the hydroponic systems it applies to.
+        from core.models import SensorReading
+
+        table = self.model._meta.db_table
+        columns = ["hydroponic_system_id", "period_start", "count"]
+        expressions = [
+            "hydroponic_system_id",
+            "date_bin(%s, created_at, %s)",
+            "COUNT(*)",
+        ]
+        for metric in SensorReading.METRICS:
+            columns += [f"{metric}_sum", f"{metric}_min", f"{metric}_max"]
+            expressions += [f"SUM({metric})", f"MIN({metric})", f"MAX({metric})"]
+
+        conditions = ["created_at >= %s", "created_at < %s"]
+        params = [self.model.period, BUCKET_ORIGIN, start, end]
+        expired = Q()
+        for first, pks in (retained_since or {}).items():
+            conditions.append(
+                "NOT (hydroponic_system_id = ANY(%s) AND created_at < %s)"
+            )
+            params += [pks, first]
+            expired |= Q(hydroponic_system__in=pks, period_start__lt=first)
+
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(expressions)} "
+            f"FROM {SensorReading._meta.db_table} "
+            f"WHERE {' AND '.join(conditions)} "
+            f"GROUP BY 1, 2"
+        )
+        rollups = self.filter(period_start__gte=start, period_start__lt=end)
+
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                # Concurrent ingestion waits for the lock, so readings committed
+                # during the rebuild are added to the rebuilt rollups.
+                cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+                rollups.exclude(expired).delete()
+                cursor.execute(sql, params)
+
+    def aggregate_buckets(self, stride):
+        from core.models import SensorReading
+
+        aggregates = {"count": Sum("count")}
+        for metric in SensorReading.METRICS:
+            aggregates[f"{metric}_sum"] = Sum(f"{metric}_sum")
+            aggregates[f"{metric}_min"] = Min(f"{metric}_min")
+            aggregates[f"{metric}_max"] = Max(f"{metric}_max")
+
+        return (
+            self.annotate(bucket=DateBin(stride, "period_start"))
+            .order_by()
+            .values("hydroponic_system", "bucket")
+            .annotate(**aggregates)
+        )
+
+
+class AlertRuleQuerySet(models.QuerySet):
+    def evaluate(self, readings):
+        from core.models import Alert, SensorReading
+
+        created_at_field = SensorReading._meta.get_field("created_at")
+        readings_by_system = defaultdict(list)
+        for reading in readings:
+            created_at = created_at_field.to_python(reading.created_at)
+            readings_by_system[reading.hydroponic_system_id].append(
+                (created_at, reading)
+            )
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Locking the rules makes concurrent ingestion of readings of the
+            # same system update their state one after another.
+            rules = list(
+                self.filter(hydroponic_system__in=readings_by_system)
+                .order_by("id")
+                .select_for_update()
+            )
+            if not rules:
+                return []
+
+            alerts = []
+            for rule in rules:
+                system_readings = readings_by_system[rule.hydroponic_system_id]
+                for created_at, reading in sorted(system_readings, key=itemgetter(0)):
+                    alerts += rule.evaluate(getattr(reading, rule.metric), created_at)
+
+            self.bulk_update(rules, self.model.STATE_FIELDS)
+            if alerts:
+                Alert.objects.using(self.db).bulk_create(alerts)
+
+        return alerts
+
 
+AlertRuleManager = AlertRuleQuerySet.as_manager
 HydroponicSystemManager = HydroponicSystemQuerySet.as_manager
+SensorReadingManager = SensorReadingQuerySet.as_manager
+SensorReadingRollupManager = SensorReadingRollupQuerySet.as_manager
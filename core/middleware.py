@@ -0,0 +1,107 @@
+import logging
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def get_view_name(resolver_match, method):
+    # Viewset actions are named like "SensorReadingViewSet.list", other views
+    # by their URL pattern names.
+    if resolver_match is None:
+        return None
+
+    view = resolver_match.func
+    cls = getattr(view, "cls", None)
+    actions = getattr(view, "actions", None)
+    if cls is not None and actions:
+        action = actions.get(method.lower())
+        if action is not None:
+            return f"{cls.__name__}.{action}"
+
+    return resolver_match.view_name
+
+
+def get_query_budget(view_name):
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class QueryBudgetMiddleware:
+    # Counts the queries of every request and logs a warning when a view makes
+    # more of them than its budget. Queries made while streaming a response
+    # are not counted. Async requests stay async, so async views are not run
+    # in a thread because of the middleware.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        with self.record_queries(recorder):
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder)
+
+    async def __acall__(self, request):
+        # Connections belong to threads, and the queries of an async request
+        # are run by `sync_to_async` in a thread of the request, so the wrappers
+        # are installed and removed in that thread.
+        recorder = QueryRecorder()
+        stack = await sync_to_async(self.record_queries)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.process_response(request, response, recorder)
+
+    @staticmethod
+    def record_queries(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def process_response(self, request, response, recorder):
+        view_name = get_view_name(request.resolver_match, request.method)
+        budget = get_query_budget(view_name)
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                "%s %s made %d queries, over the budget of %s (%s)",
+                request.method,
+                request.path,
+                recorder.count,
+                budget,
+                view_name,
+            )
+
+        if settings.QUERY_BUDGET_HEADERS:
+            response["X-Query-Count"] = recorder.count
+            response["X-Query-Duration"] = f"{recorder.duration * 1000:.1f}ms"
+
+        return response
@@ -0,0 +1,48 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 50000
+
+
+def backfill_owner(apps, schema_editor):
+    SensorReading = apps.get_model("core", "SensorReading")
+    table = SensorReading._meta.db_table
+    system_table = SensorReading._meta.get_field(
+        "hydroponic_system"
+    ).related_model._meta.db_table
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+        min_id, max_id = cursor.fetchone()
+
+    if min_id is None:
+        return
+
+    # Every batch is committed separately so that locks on the updated rows
+    # are held only for the duration of a single batch.
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE {table} AS reading
+                    SET owner_id = system.owner_id
+                    FROM {system_table} AS system
+                    WHERE reading.hydroponic_system_id = system.id
+                        AND reading.owner_id IS NULL
+                        AND reading.id >= %s AND reading.id < %s
+                    """,
+                    [start, start + BATCH_SIZE],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("core", "0003_sensorreading_owner"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop, elidable=True),
+    ]
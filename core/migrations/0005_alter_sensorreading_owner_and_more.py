@@ -0,0 +1,81 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:08
+
+from importlib import import_module
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+TABLE = "core_sensorreading"
+CHECK = "core_sensorreading_owner_not_null"
+
+
+def backfill_owner(apps, schema_editor):
+    # Readings created without an owner by code running after the backfill of
+    # 0004 are rejected by the check from now on, but the earlier ones have to
+    # be backfilled before the check is validated.
+    backfill = import_module("core.migrations.0004_backfill_sensorreading_owner")
+    backfill.backfill_owner(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("core", "0004_backfill_sensorreading_owner"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # `SET NOT NULL` alone would scan the table under an ACCESS EXCLUSIVE lock.
+    # A NOT VALID check is added instantly, is validated under a lock that
+    # allows reads and writes, and lets `SET NOT NULL` skip the scan.
+    operations = [
+        migrations.RunSQL(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {CHECK} "
+            f"CHECK (owner_id IS NOT NULL) NOT VALID",
+            f"ALTER TABLE {TABLE} DROP CONSTRAINT {CHECK}",
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+        migrations.RunSQL(
+            f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT {CHECK}", migrations.RunSQL.noop
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f"ALTER TABLE {TABLE} ALTER COLUMN owner_id SET NOT NULL",
+                    f"ALTER TABLE {TABLE} ALTER COLUMN owner_id DROP NOT NULL",
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="sensorreading",
+                    name="owner",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sensor_readings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            f"ALTER TABLE {TABLE} DROP CONSTRAINT {CHECK}",
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {CHECK} "
+            f"CHECK (owner_id IS NOT NULL) NOT VALID",
+        ),
+        AddIndexConcurrently(
+            model_name="sensorreading",
+            index=models.Index(
+                fields=["owner", "created_at"], name="core_sensor_owner_i_e30ac2_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="sensorreading",
+            index=models.Index(
+                fields=["hydroponic_system", "created_at"],
+                name="core_sensor_hydropo_3f1987_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:11
+
+import django.db.models.deletion
+from datetime import datetime, timedelta, timezone
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    SensorReading = apps.get_model("core", "SensorReading")
+    rollups = [
+        (apps.get_model("core", "HourlySensorReadingRollup"), timedelta(hours=1)),
+        (apps.get_model("core", "DailySensorReadingRollup"), timedelta(days=1)),
+    ]
+    origin = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+    with schema_editor.connection.cursor() as cursor:
+        for model, period in rollups:
+            cursor.execute(
+                f"""
+                INSERT INTO {model._meta.db_table} (
+                    hydroponic_system_id, period_start, count,
+                    ph_sum, ph_min, ph_max,
+                    water_temp_sum, water_temp_min, water_temp_max,
+                    tds_sum, tds_min, tds_max
+                )
+                SELECT
+                    hydroponic_system_id, date_bin(%s, created_at, %s), COUNT(*),
+                    SUM(ph), MIN(ph), MAX(ph),
+                    SUM(water_temp), MIN(water_temp), MAX(water_temp),
+                    SUM(tds), MIN(tds), MAX(tds)
+                FROM {SensorReading._meta.db_table}
+                GROUP BY 1, 2
+                """,
+                [period, origin],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_alter_sensorreading_owner_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySensorReadingRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period_start", models.DateTimeField()),
+                ("count", models.PositiveBigIntegerField()),
+                ("ph_sum", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("ph_min", models.DecimalField(decimal_places=2, max_digits=4)),
+                ("ph_max", models.DecimalField(decimal_places=2, max_digits=4)),
+                (
+                    "water_temp_sum",
+                    models.DecimalField(decimal_places=2, max_digits=20),
+                ),
+                ("water_temp_min", models.DecimalField(decimal_places=2, max_digits=5)),
+                ("water_temp_max", models.DecimalField(decimal_places=2, max_digits=5)),
+                ("tds_sum", models.DecimalField(decimal_places=2, max_digits=24)),
+                ("tds_min", models.DecimalField(decimal_places=2, max_digits=7)),
+                ("tds_max", models.DecimalField(decimal_places=2, max_digits=7)),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.hydroponicsystem",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="HourlySensorReadingRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period_start", models.DateTimeField()),
+                ("count", models.PositiveBigIntegerField()),
+                ("ph_sum", models.DecimalField(decimal_places=2, max_digits=20)),
+                ("ph_min", models.DecimalField(decimal_places=2, max_digits=4)),
+                ("ph_max", models.DecimalField(decimal_places=2, max_digits=4)),
+                (
+                    "water_temp_sum",
+                    models.DecimalField(decimal_places=2, max_digits=20),
+                ),
+                ("water_temp_min", models.DecimalField(decimal_places=2, max_digits=5)),
+                ("water_temp_max", models.DecimalField(decimal_places=2, max_digits=5)),
+                ("tds_sum", models.DecimalField(decimal_places=2, max_digits=24)),
+                ("tds_min", models.DecimalField(decimal_places=2, max_digits=7)),
+                ("tds_max", models.DecimalField(decimal_places=2, max_digits=7)),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.hydroponicsystem",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailysensorreadingrollup",
+            constraint=models.UniqueConstraint(
+                fields=("hydroponic_system", "period_start"),
+                name="core_dailysensorreadingrollup_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="hourlysensorreadingrollup",
+            constraint=models.UniqueConstraint(
+                fields=("hydroponic_system", "period_start"),
+                name="core_hourlysensorreadingrollup_unique",
+            ),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
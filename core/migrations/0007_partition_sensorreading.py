@@ -0,0 +1,200 @@
+from django.db import migrations, transaction
+from django.utils import timezone
+from core import partitions
+
+TABLE = "core_sensorreading"
+LEGACY_TABLE = "core_sensorreading_legacy"
+LEGACY_PKEY = f"{LEGACY_TABLE}_pkey"
+LEGACY_CHECK = f"{LEGACY_TABLE}_created_at_check"
+UNPARTITIONED_TABLE = "core_sensorreading_unpartitioned"
+PARTITIONS_AHEAD = 3
+COLUMNS = """
+    ph numeric(4, 2) NOT NULL,
+    water_temp numeric(5, 2) NOT NULL,
+    tds numeric(7, 2) NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    hydroponic_system_id bigint NOT NULL,
+    owner_id bigint NOT NULL
+"""
+
+
+def get_indexes(cursor, table):
+    # The name, the definition and whether it is the primary key of every index.
+    cursor.execute(
+        """
+        SELECT index.relname, pg_get_indexdef(index.oid), pg_index.indisprimary
+        FROM pg_index
+        JOIN pg_class index ON index.oid = pg_index.indexrelid
+        WHERE pg_index.indrelid = %s::regclass
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def get_foreign_keys(cursor, table):
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def copy_index(cursor, definition, table):
+    # Creates the index with the same name, kind and columns on another table.
+    prefix, rest = definition.split(" ON ", 1)
+    cursor.execute(f"{prefix} ON {table} USING {rest.split(' USING ', 1)[1]}")
+
+
+def partition_sensor_readings(apps, schema_editor):
+    # The existing table becomes the partition of all the readings older than
+    # `split`, so that no reading has to be copied. Everything that scans the
+    # table runs before the ACCESS EXCLUSIVE lock is taken, and the lock is only
+    # held for changes of the catalog.
+    using = schema_editor.connection.alias
+    interval = partitions.get_interval()
+    now = timezone.now()
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT MAX(created_at) FROM {TABLE}")
+        latest = max(cursor.fetchone()[0] or now, now)
+        # Readings keep being added to the table until it is attached, so the
+        # split is at least a whole partition ahead.
+        split = partitions.floor_partition(latest, interval)
+        for _ in range(2):
+            split = partitions.next_partition(split, interval)
+
+        # The partition key has to be a part of the primary key, so it consists
+        # of `id` and `created_at`. Django still treats `id` as the primary key,
+        # which stays unique because it is generated from a single sequence.
+        cursor.execute(
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {LEGACY_PKEY} "
+            f"ON {TABLE} (id, created_at)"
+        )
+        # A validated check matching the bounds of the partition lets attaching
+        # it skip the scan. It is validated under a lock that allows reads and
+        # writes.
+        cursor.execute(f"ALTER TABLE {TABLE} DROP CONSTRAINT IF EXISTS {LEGACY_CHECK}")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {LEGACY_CHECK} "
+            f"CHECK (created_at < %s) NOT VALID",
+            [split],
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT {LEGACY_CHECK}")
+
+    with transaction.atomic(using=using), schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        indexes = get_indexes(cursor, TABLE)
+        foreign_keys = get_foreign_keys(cursor, TABLE)
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {TABLE})")
+        has_readings = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER id DROP IDENTITY IF EXISTS")
+        [pkey] = [name for name, _, primary in indexes if primary]
+        cursor.execute(
+            f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {pkey}, "
+            f"ADD CONSTRAINT {LEGACY_PKEY} PRIMARY KEY USING INDEX {LEGACY_PKEY}"
+        )
+        for name, _, primary in indexes:
+            if not primary and name != LEGACY_PKEY:
+                cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:56]}_legacy")
+
+        # The indexes and foreign keys are added while the table is empty, and
+        # the equivalent ones of the legacy partition are attached to them.
+        cursor.execute(
+            f"CREATE TABLE {TABLE} ("
+            f"id bigint GENERATED BY DEFAULT AS IDENTITY, {COLUMNS}, "
+            f"CONSTRAINT {pkey} PRIMARY KEY (id, created_at)"
+            f") PARTITION BY RANGE (created_at)"
+        )
+        for name, definition, primary in indexes:
+            if not primary and name != LEGACY_PKEY:
+                copy_index(cursor, definition, TABLE)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+        if has_readings:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_TABLE} "
+                f"FOR VALUES FROM (MINVALUE) TO (%s)",
+                [split],
+            )
+            cursor.execute(f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {LEGACY_CHECK}")
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), MAX(id)) "
+                f"FROM {TABLE}"
+            )
+        else:
+            cursor.execute(f"DROP TABLE {LEGACY_TABLE}")
+
+        cursor.execute(
+            f"CREATE TABLE {partitions.get_default_partition_name(TABLE)} "
+            f"PARTITION OF {TABLE} DEFAULT"
+        )
+
+    end = partitions.floor_partition(now, interval)
+    for _ in range(PARTITIONS_AHEAD):
+        end = partitions.next_partition(end, interval)
+    partitions.create_partitions(
+        TABLE, split if has_readings else now, end, interval, using
+    )
+
+
+def unpartition_sensor_readings(apps, schema_editor):
+    # Copies the readings back to a plain table, holding the lock for the whole
+    # copy.
+    with transaction.atomic(using=schema_editor.connection.alias):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+            indexes = get_indexes(cursor, TABLE)
+            foreign_keys = get_foreign_keys(cursor, TABLE)
+
+            cursor.execute(
+                f"CREATE TABLE {UNPARTITIONED_TABLE} ("
+                f"id bigint GENERATED BY DEFAULT AS IDENTITY, {COLUMNS})"
+            )
+            cursor.execute(
+                f"INSERT INTO {UNPARTITIONED_TABLE} "
+                f"(id, ph, water_temp, tds, created_at, hydroponic_system_id, owner_id) "
+                f"SELECT id, ph, water_temp, tds, created_at, hydroponic_system_id, "
+                f"owner_id FROM {TABLE}"
+            )
+            cursor.execute(f"DROP TABLE {TABLE}")
+            cursor.execute(f"ALTER TABLE {UNPARTITIONED_TABLE} RENAME TO {TABLE}")
+            cursor.execute(
+                f"ALTER SEQUENCE {UNPARTITIONED_TABLE}_id_seq RENAME TO {TABLE}_id_seq"
+            )
+
+            for name, definition, primary in indexes:
+                if primary:
+                    cursor.execute(
+                        f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} PRIMARY KEY (id)"
+                    )
+                else:
+                    copy_index(cursor, definition, TABLE)
+            for name, definition in foreign_keys:
+                cursor.execute(
+                    f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}"
+                )
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+                f"COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}"
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("core", "0006_sensor_reading_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_sensor_readings, unpartition_sensor_readings),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_partition_sensorreading"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RetentionPolicy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "raw_retention_days",
+                    models.PositiveIntegerField(blank=True, null=True),
+                ),
+                (
+                    "hourly_rollup_retention_days",
+                    models.PositiveIntegerField(blank=True, null=True),
+                ),
+                (
+                    "hydroponic_system",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="retention_policy",
+                        to="core.hydroponicsystem",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="retention_policy",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "retention policies",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="retentionpolicy",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("hydroponic_system__isnull", True), ("owner__isnull", False)
+                    ),
+                    models.Q(
+                        ("hydroponic_system__isnull", False), ("owner__isnull", True)
+                    ),
+                    _connector="OR",
+                ),
+                name="core_retentionpolicy_owner_xor_hydroponic_system",
+            ),
+        ),
+    ]
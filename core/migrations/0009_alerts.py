@@ -0,0 +1,144 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:37
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_retentionpolicy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("ph", "ph"),
+                            ("water_temp", "water_temp"),
+                            ("tds", "tds"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "min_value",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=7, null=True
+                    ),
+                ),
+                (
+                    "max_value",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=7, null=True
+                    ),
+                ),
+                (
+                    "window",
+                    models.PositiveIntegerField(
+                        default=12,
+                        validators=[django.core.validators.MinValueValidator(1)],
+                    ),
+                ),
+                (
+                    "max_deviation",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=4, null=True
+                    ),
+                ),
+                ("count", models.PositiveBigIntegerField(default=0)),
+                ("mean", models.FloatField(blank=True, null=True)),
+                ("variance", models.FloatField(blank=True, null=True)),
+                ("value_out_of_range", models.BooleanField(default=False)),
+                ("mean_out_of_range", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_rules",
+                        to="core.hydroponicsystem",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Alert",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("out_of_range", "The value left the range"),
+                            ("drift", "The rolling mean left the range"),
+                            ("deviation", "The value deviated from the rolling mean"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("ph", "ph"),
+                            ("water_temp", "water_temp"),
+                            ("tds", "tds"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("value", models.DecimalField(decimal_places=2, max_digits=7)),
+                ("mean", models.FloatField()),
+                ("stddev", models.FloatField()),
+                ("created_at", models.DateTimeField()),
+                (
+                    "hydroponic_system",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alerts",
+                        to="core.hydroponicsystem",
+                    ),
+                ),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alerts",
+                        to="core.alertrule",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["hydroponic_system", "created_at"],
+                        name="core_alert_hydropo_134d75_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    HydroponicSystem = apps.get_model("core", "HydroponicSystem")
+    SensorReading = apps.get_model("core", "SensorReading")
+    table = HydroponicSystem._meta.db_table
+    reading_table = SensorReading._meta.db_table
+
+    # A single pass over the readings per statement instead of a lookup per
+    # system.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} AS system
+            SET reading_count = counts.count
+            FROM (
+                SELECT hydroponic_system_id, COUNT(*) AS count
+                FROM {reading_table}
+                GROUP BY hydroponic_system_id
+            ) AS counts
+            WHERE system.id = counts.hydroponic_system_id
+            """)
+        cursor.execute(f"""
+            UPDATE {table} AS system
+            SET last_reading_at = latest.created_at,
+                last_ph = latest.ph,
+                last_water_temp = latest.water_temp,
+                last_tds = latest.tds
+            FROM (
+                SELECT DISTINCT ON (hydroponic_system_id)
+                    hydroponic_system_id, created_at, ph, water_temp, tds
+                FROM {reading_table}
+                ORDER BY hydroponic_system_id, created_at DESC
+            ) AS latest
+            WHERE system.id = latest.hydroponic_system_id
+            """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_alerts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hydroponicsystem",
+            name="last_ph",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=4, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="hydroponicsystem",
+            name="last_reading_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="hydroponicsystem",
+            name="last_tds",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=7, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="hydroponicsystem",
+            name="last_water_temp",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=5, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="hydroponicsystem",
+            name="reading_count",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="hydroponicsystem",
+            index=models.Index(
+                fields=["owner", "last_reading_at"],
+                name="core_hydrop_owner_i_e5ed4e_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hydroponicsystem",
+            index=models.Index(
+                fields=["owner", "reading_count"], name="core_hydrop_owner_i_2b8dd9_idx"
+            ),
+        ),
+        migrations.RunPython(
+            backfill_counters, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -1,7 +1,16 @@
+import math
+from datetime import timedelta
+from decimal import Decimal
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
-from core.managers import HydroponicSystemManager
+from core.managers import (
+    AlertRuleManager,
+    HydroponicSystemManager,
+    SensorReadingManager,
+    SensorReadingRollupManager,
+)
 
 
 class User(AbstractUser):
@@ -16,15 +25,257 @@ class HydroponicSystem(models.Model):
         User, on_delete=models.CASCADE, related_name="hydroponic_systems"
     )
     created_at = models.DateTimeField(default=timezone.now)
+    # Denormalized from the readings on ingestion, so that the activity of the
+    # systems can be listed, filtered and sorted without scanning the readings.
+    reading_count = models.PositiveBigIntegerField(default=0, editable=False)
+    last_reading_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_ph = models.DecimalField(
+        max_digits=4, decimal_places=2, null=True, blank=True, editable=False
+    )
+    last_water_temp = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True, editable=False
+    )
+    last_tds = models.DecimalField(
+        max_digits=7, decimal_places=2, null=True, blank=True, editable=False
+    )
 
     objects = HydroponicSystemManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "last_reading_at"]),
+            models.Index(fields=["owner", "reading_count"]),
+        ]
+
 
 class SensorReading(models.Model):
+    METRICS = ("ph", "water_temp", "tds")
+
     ph = models.DecimalField(max_digits=4, decimal_places=2)
     water_temp = models.DecimalField(max_digits=5, decimal_places=2)
     tds = models.DecimalField(max_digits=7, decimal_places=2)
     hydroponic_system = models.ForeignKey(
         HydroponicSystem, on_delete=models.CASCADE, related_name="sensor_readings"
     )
+    # Denormalized from `hydroponic_system` so that readings can be filtered
+    # by owner without joining the hydroponic systems table.
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="sensor_readings", db_index=False
+    )
     created_at = models.DateTimeField(default=timezone.now)
+
+    objects = SensorReadingManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "created_at"]),
+            models.Index(fields=["hydroponic_system", "created_at"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.owner_id is None:
+            self.owner_id = self.hydroponic_system.owner_id
+        super().save(*args, **kwargs)
+
+
+class SensorReadingRollup(models.Model):
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name="+"
+    )
+    period_start = models.DateTimeField()
+    count = models.PositiveBigIntegerField()
+    ph_sum = models.DecimalField(max_digits=20, decimal_places=2)
+    ph_min = models.DecimalField(max_digits=4, decimal_places=2)
+    ph_max = models.DecimalField(max_digits=4, decimal_places=2)
+    water_temp_sum = models.DecimalField(max_digits=20, decimal_places=2)
+    water_temp_min = models.DecimalField(max_digits=5, decimal_places=2)
+    water_temp_max = models.DecimalField(max_digits=5, decimal_places=2)
+    tds_sum = models.DecimalField(max_digits=24, decimal_places=2)
+    tds_min = models.DecimalField(max_digits=7, decimal_places=2)
+    tds_max = models.DecimalField(max_digits=7, decimal_places=2)
+
+    objects = SensorReadingRollupManager()
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hydroponic_system", "period_start"],
+                name="%(app_label)s_%(class)s_unique",
+            )
+        ]
+
+
+class HourlySensorReadingRollup(SensorReadingRollup):
+    period = timedelta(hours=1)
+
+
+class DailySensorReadingRollup(SensorReadingRollup):
+    period = timedelta(days=1)
+
+
+class RetentionPolicy(models.Model):
+    # A policy applies either to a single hydroponic system or to all systems of
+    # an owner. The most specific policy wins and, without any, the defaults
+    # from the settings are used. Empty retention periods mean no expiration.
+    owner = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="retention_policy",
+        null=True,
+        blank=True,
+    )
+    hydroponic_system = models.OneToOneField(
+        HydroponicSystem,
+        on_delete=models.CASCADE,
+        related_name="retention_policy",
+        null=True,
+        blank=True,
+    )
+    raw_retention_days = models.PositiveIntegerField(null=True, blank=True)
+    hourly_rollup_retention_days = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "retention policies"
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(owner__isnull=False, hydroponic_system__isnull=True)
+                | models.Q(owner__isnull=True, hydroponic_system__isnull=False),
+                name="core_retentionpolicy_owner_xor_hydroponic_system",
+            )
+        ]
+
+
+class AlertRule(models.Model):
+    # Checks a metric of every new reading of a hydroponic system against the
+    # range between `min_value` and `max_value` and, with `max_deviation`,
+    # against the rolling mean. The rolling mean and variance are exponentially
+    # weighted over about `window` readings and updated in place, so a reading
+    # is evaluated in constant time and the state survives restarts.
+    METRIC_CHOICES = [(metric, metric) for metric in SensorReading.METRICS]
+
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name="alert_rules"
+    )
+    metric = models.CharField(max_length=10, choices=METRIC_CHOICES)
+    min_value = models.DecimalField(
+        max_digits=7, decimal_places=2, null=True, blank=True
+    )
+    max_value = models.DecimalField(
+        max_digits=7, decimal_places=2, null=True, blank=True
+    )
+    window = models.PositiveIntegerField(default=12, validators=[MinValueValidator(1)])
+    # The number of standard deviations from the rolling mean.
+    max_deviation = models.DecimalField(
+        max_digits=4, decimal_places=2, null=True, blank=True
+    )
+    count = models.PositiveBigIntegerField(default=0)
+    mean = models.FloatField(null=True, blank=True)
+    variance = models.FloatField(null=True, blank=True)
+    value_out_of_range = models.BooleanField(default=False)
+    mean_out_of_range = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = AlertRuleManager()
+
+    STATE_FIELDS = [
+        "count",
+        "mean",
+        "variance",
+        "value_out_of_range",
+        "mean_out_of_range",
+    ]
+
+    @property
+    def stddev(self):
+        return None if self.variance is None else math.sqrt(self.variance)
+
+    def in_range(self, value):
+        return (self.min_value is None or value >= self.min_value) and (
+            self.max_value is None or value <= self.max_value
+        )
+
+    def reset(self):
+        self.count = 0
+        self.mean = None
+        self.variance = None
+        self.value_out_of_range = False
+        self.mean_out_of_range = False
+
+    def evaluate(self, value, created_at):
+        # Updates the state with the value of a new reading and returns the
+        # alerts it triggers. Range alerts are only triggered when the value or
+        # the mean leaves the range, not for every reading outside of it.
+        value = Decimal(value)
+        x = float(value)
+        kinds = []
+
+        warmed_up = self.count >= self.window
+        if self.max_deviation is not None and warmed_up and self.variance > 0:
+            if abs(x - self.mean) > float(self.max_deviation) * self.stddev:
+                kinds.append(Alert.DEVIATION)
+
+        if self.count == 0:
+            self.mean = x
+            self.variance = 0.0
+        else:
+            alpha = 2 / (self.window + 1)
+            diff = x - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.count += 1
+
+        out_of_range = not self.in_range(value)
+        if out_of_range and not self.value_out_of_range:
+            kinds.append(Alert.OUT_OF_RANGE)
+        self.value_out_of_range = out_of_range
+
+        if self.count >= self.window:
+            mean_out_of_range = not self.in_range(self.mean)
+            if mean_out_of_range and not self.mean_out_of_range:
+                kinds.append(Alert.DRIFT)
+            self.mean_out_of_range = mean_out_of_range
+
+        return [
+            Alert(
+                rule=self,
+                hydroponic_system_id=self.hydroponic_system_id,
+                kind=kind,
+                metric=self.metric,
+                value=value,
+                mean=self.mean,
+                stddev=self.stddev,
+                created_at=created_at,
+            )
+            for kind in kinds
+        ]
+
+
+class Alert(models.Model):
+    OUT_OF_RANGE = "out_of_range"
+    DRIFT = "drift"
+    DEVIATION = "deviation"
+    KIND_CHOICES = [
+        (OUT_OF_RANGE, "The value left the range"),
+        (DRIFT, "The rolling mean left the range"),
+        (DEVIATION, "The value deviated from the rolling mean"),
+    ]
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name="alerts")
+    # Denormalized from `rule` so that alerts can be filtered by system and
+    # owner without joining the rules table.
+    hydroponic_system = models.ForeignKey(
+        HydroponicSystem, on_delete=models.CASCADE, related_name="alerts"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    metric = models.CharField(max_length=10, choices=AlertRule.METRIC_CHOICES)
+    value = models.DecimalField(max_digits=7, decimal_places=2)
+    # The rolling statistics after the reading.
+    mean = models.FloatField()
+    stddev = models.FloatField()
+    # The time of the reading that triggered the alert.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["hydroponic_system", "created_at"])]
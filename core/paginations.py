@@ -1,9 +1,196 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination, Cursor
+
+
+class KeysetCursorPagination(CursorPagination):
+    # Unlike `CursorPagination`, the cursor stores the values of all ordering
+    # fields instead of the first one and an offset, so every page is a plain
+    # index range scan. The tiebreaker makes the position unique.
+    ordering = "created_at"
+    tiebreaker = "id"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+
+        if not any(field.lstrip("-") in ("pk", self.tiebreaker) for field in ordering):
+            prefix = "-" if ordering[0].startswith("-") else ""
+            ordering.append(prefix + self.tiebreaker)
+
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            self.reverse, self.position = False, None
+        else:
+            self.reverse = self.cursor.reverse
+            self.position = self.decode_position(queryset.model, self.cursor.position)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(ordering, self.position)
+            )
+
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        position = self.encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        position = self.encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_position_filter(self, ordering, position):
+        equal = Q()
+        after = Q()
+
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            after |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        # Bounding the leading field lets the database use it as an index range.
+        name = ordering[0].lstrip("-")
+        lookup = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{name}__{lookup}": position[0]}) & after
+
+    def encode_position(self, row):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def decode_position(self, model, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
 
 
 class HydroponicSystemPagination(PageNumberPagination):
     page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class SensorReadingCursorPagination(KeysetCursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
 
 
 class SensorReadingPagination(PageNumberPagination):
     page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+    pagination_query_param = "pagination"
+    cursor_pagination_class = SensorReadingCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+
+        query_params = request.query_params
+        if (
+            query_params.get(self.pagination_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param in query_params
+        ):
+            self.cursor_pagination = self.cursor_pagination_class()
+            page = self.cursor_pagination.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.cursor_pagination.display_page_controls
+            return page
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.to_html()
+        return super().to_html()
+
+
+class AlertRulePagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class AlertPagination(KeysetCursorPagination):
+    ordering = "-created_at"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
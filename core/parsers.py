@@ -0,0 +1,44 @@
+from decimal import Decimal
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from core.renderers import (
+    SENSOR_READING_MEDIA_TYPE,
+    SENSOR_READING_RECORD,
+    SENSOR_READING_SCALE,
+)
+
+
+class SensorReadingBinaryParser(BaseParser):
+    # Parses a sequence of `SENSOR_READING_RECORD`s. The id and creation time of
+    # the records are ignored, because they are assigned by the server. A single
+    # record is parsed into a dictionary, unless the view expects a list.
+    media_type = SENSOR_READING_MEDIA_TYPE
+    many_actions = ["bulk"]
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        content = stream.read() if stream is not None else b""
+
+        if not content or len(content) % SENSOR_READING_RECORD.size:
+            raise ParseError(
+                f"Binary sensor readings must consist of "
+                f"{SENSOR_READING_RECORD.size} byte records."
+            )
+
+        data = [
+            {
+                "hydroponic_system": hydroponic_system,
+                "ph": Decimal(ph).scaleb(-SENSOR_READING_SCALE),
+                "water_temp": Decimal(water_temp).scaleb(-SENSOR_READING_SCALE),
+                "tds": Decimal(tds).scaleb(-SENSOR_READING_SCALE),
+            }
+            for _, hydroponic_system, _, ph, water_temp, tds in (
+                SENSOR_READING_RECORD.iter_unpack(content)
+            )
+        ]
+
+        view = (parser_context or {}).get("view")
+        if getattr(view, "action", None) in self.many_actions:
+            return data
+        if len(data) != 1:
+            raise ParseError("Expected a single binary sensor reading.")
+        return data[0]
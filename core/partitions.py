@@ -0,0 +1,149 @@
+import re
+from collections import namedtuple
+from datetime import timedelta, timezone
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+Partition = namedtuple("Partition", ["name", "start", "end"])
+
+INTERVALS = ["day", "week", "month"]
+BOUNDS_RE = re.compile(
+    r"FROM \((?:'(?P<start>[^']+)'|MINVALUE)\) TO \('(?P<end>[^']+)'\)"
+)
+
+
+def get_interval():
+    interval = settings.SENSOR_READING_PARTITION_INTERVAL
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported partition interval: {interval}.")
+    return interval
+
+
+def floor_partition(value, interval=None):
+    interval = interval or get_interval()
+    value = value.astimezone(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+    if interval == "week":
+        value -= timedelta(days=value.weekday())
+    elif interval == "month":
+        value = value.replace(day=1)
+
+    return value
+
+
+def next_partition(start, interval=None):
+    interval = interval or get_interval()
+
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(weeks=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def get_partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def get_default_partition_name(table):
+    return f"{table}_default"
+
+
+def get_partitions(table, using="default"):
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bounds in rows:
+        match = BOUNDS_RE.search(bounds)
+        if match is None:
+            continue
+        # The legacy partition of the readings stored before the table was
+        # partitioned has no lower bound.
+        start = match["start"] and parse_datetime(match["start"])
+        end = parse_datetime(match["end"])
+        partitions.append(Partition(name, start, end))
+
+    return sorted(partitions, key=lambda partition: partition.end)
+
+
+def create_partition(table, start, interval=None, using="default"):
+    end = next_partition(start, interval)
+    name = get_partition_name(table, start)
+    default = get_default_partition_name(table)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    for partition in get_partitions(table, using):
+        if (partition.start is None or partition.start < end) and start < partition.end:
+            return None
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT 1 FROM {qn(default)} WHERE created_at >= %s AND created_at < %s "
+            f"LIMIT 1",
+            [start, end],
+        )
+
+        if cursor.fetchone() is None:
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+        else:
+            # Rows of the new partition that were stored in the default
+            # partition have to be moved before the partition can be attached.
+            cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            cursor.execute(
+                f"WITH moved AS ("
+                f"DELETE FROM {qn(default)} "
+                f"WHERE created_at >= %s AND created_at < %s RETURNING *"
+                f") INSERT INTO {qn(table)} SELECT * FROM moved",
+                [start, end],
+            )
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT"
+            )
+
+    return Partition(name, start, end)
+
+
+def create_partitions(table, start, end, interval=None, using="default"):
+    created = []
+    start = floor_partition(start, interval)
+
+    while start <= end:
+        partition = create_partition(table, start, interval, using)
+        if partition is not None:
+            created.append(partition)
+        start = next_partition(start, interval)
+
+    return created
+
+
+def drop_partition(table, name, using="default"):
+    qn = connections[using].ops.quote_name
+
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+        cursor.execute(f"DROP TABLE {qn(name)}")
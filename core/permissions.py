@@ -1,8 +1,16 @@
 from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied
 
 
 class IsHydroponicSystemOwner(permissions.BasePermission):
     message = "You cannot access other users' hydroponic systems."
 
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        return obj.owner_id == request.user.pk
+
+
+def check_hydroponic_system_owner(request, systems):
+    # Called after validation, so that invalid data is reported with all the
+    # field errors before the ownership of the referenced systems is checked.
+    if any(system.owner_id != request.user.pk for system in systems):
+        raise PermissionDenied("You are not the owner of the hydroponic system.")
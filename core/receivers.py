@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from core import live
+from core.cache import (
+    bump_owner_versions,
+    delete_cached_auth,
+    get_token_auth_key,
+    get_user_auth_key,
+    pin_owners_to_primary,
+)
+from core.models import (
+    AlertRule,
+    DailySensorReadingRollup,
+    HourlySensorReadingRollup,
+    HydroponicSystem,
+    SensorReading,
+    User,
+)
+from core.signals import sensor_readings_created
+
+
+@receiver(post_save, sender=SensorReading)
+def send_sensor_readings_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        sensor_readings_created.send(sender=sender, readings=[instance])
+
+
+@receiver(sensor_readings_created)
+def update_sensor_reading_rollups(sender, readings, **kwargs):
+    HourlySensorReadingRollup.objects.record(readings)
+    DailySensorReadingRollup.objects.record(readings)
+
+
+@receiver(sensor_readings_created)
+def update_hydroponic_system_counters(sender, readings, **kwargs):
+    HydroponicSystem.objects.record_sensor_readings(readings)
+
+
+@receiver(sensor_readings_created)
+def evaluate_alert_rules(sender, readings, **kwargs):
+    AlertRule.objects.evaluate(readings)
+
+
+@receiver(sensor_readings_created)
+def notify_sensor_readings_created(sender, readings, **kwargs):
+    if settings.SENSOR_READING_LIVE_ENABLED:
+        live.notify(readings)
+
+
+# The owner versions are bumped and the owners pinned once the writes are
+# committed. Otherwise a concurrent request could cache the responses it built
+# from the data before the commit under the new version.
+@receiver(sensor_readings_created)
+def invalidate_sensor_reading_owner_responses(sender, readings, **kwargs):
+    owner_ids = {reading.owner_id for reading in readings}
+    transaction.on_commit(lambda: bump_owner_versions(owner_ids))
+
+
+@receiver(post_save, sender=HydroponicSystem)
+@receiver(post_delete, sender=HydroponicSystem)
+def invalidate_hydroponic_system_owner_responses(sender, instance, using, **kwargs):
+    owner_ids = [instance.owner_id]
+    transaction.on_commit(lambda: bump_owner_versions(owner_ids), using=using)
+
+
+@receiver(sensor_readings_created)
+def pin_sensor_reading_owners_to_primary(sender, readings, **kwargs):
+    owner_ids = {reading.owner_id for reading in readings}
+    transaction.on_commit(lambda: pin_owners_to_primary(owner_ids))
+
+
+@receiver(post_save, sender=HydroponicSystem)
+@receiver(post_delete, sender=HydroponicSystem)
+def pin_hydroponic_system_owner_to_primary(sender, instance, using, **kwargs):
+    owner_ids = [instance.owner_id]
+    transaction.on_commit(lambda: pin_owners_to_primary(owner_ids), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_auth(sender, instance, **kwargs):
+    keys = Token.objects.filter(user_id=instance.pk).values_list("key", flat=True)
+    delete_cached_auth(
+        [get_user_auth_key(instance.pk), *(get_token_auth_key(key) for key in keys)]
+    )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_auth(sender, instance, **kwargs):
+    delete_cached_auth([get_token_auth_key(instance.key)])
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user_auth(sender, user, **kwargs):
+    if user is not None:
+        delete_cached_auth([get_user_auth_key(user.pk)])
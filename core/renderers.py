@@ -0,0 +1,201 @@
+import csv
+import io
+import json
+import struct
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from operator import itemgetter
+from django.utils.dateparse import parse_datetime
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# A sensor reading in the binary format: id, hydroponic system id, creation time
+# in microseconds since the Unix epoch, and pH, water temperature and TDS
+# multiplied by 100, little-endian.
+SENSOR_READING_RECORD = struct.Struct("<qqqhii")
+SENSOR_READING_RECORD_FIELDS = (
+    "id",
+    "hydroponic_system",
+    "created_at",
+    "ph",
+    "water_temp",
+    "tds",
+)
+SENSOR_READING_MEDIA_TYPE = "application/vnd.hydroponics.sensor-readings"
+SENSOR_READING_SCALE = 2
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def format_value(value):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return value
+
+
+class StreamingRenderer(BaseRenderer):
+    chunk_size = 1000
+
+    def render_exception(self, data, renderer_context):
+        # Errors are not rows, so they are rendered as JSON. Returns None for
+        # other responses.
+        response = (renderer_context or {}).get("response")
+        if response is None or not response.exception:
+            return None
+
+        response["Content-Type"] = "application/json"
+        return JSONRenderer().render(data, renderer_context=renderer_context)
+
+    def render_rows(self, fields, rows):
+        raise NotImplementedError
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        content = self.render_exception(data, renderer_context)
+        if content is not None:
+            return content
+
+        if isinstance(data, dict):
+            data = [data]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if data:
+            writer.writerow(data[0].keys())
+        for item in data:
+            writer.writerow(format_value(value) for value in item.values())
+        return buffer.getvalue().encode(self.charset)
+
+    def render_rows(self, fields, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+
+        for i, row in enumerate(rows, 1):
+            writer.writerow([format_value(value) for value in row])
+            if i % self.chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        content = self.render_exception(data, renderer_context)
+        if content is not None:
+            return content
+
+        if isinstance(data, dict):
+            data = [data]
+
+        lines = (json.dumps(item, default=format_value) + "\n" for item in data)
+        return "".join(lines).encode(self.charset)
+
+    def render_rows(self, fields, rows):
+        lines = []
+
+        for i, row in enumerate(rows, 1):
+            item = {field: format_value(value) for field, value in zip(fields, row)}
+            lines.append(json.dumps(item) + "\n")
+            if i % self.chunk_size == 0:
+                yield "".join(lines)
+                lines.clear()
+
+        yield "".join(lines)
+
+
+class SensorReadingBinaryRenderer(StreamingRenderer):
+    # Renders sensor readings as a sequence of `SENSOR_READING_RECORD`s. Both
+    # `values()` rows and serialized readings are accepted. Pagination links and
+    # the count are moved to the `Link` and `X-Total-Count` headers, and errors
+    # are rendered as JSON.
+    media_type = SENSOR_READING_MEDIA_TYPE
+    format = "bin"
+    charset = None
+    render_values = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        response = renderer_context.get("response")
+
+        if data is None:
+            return b""
+
+        content = self.render_exception(data, renderer_context)
+        if content is not None:
+            return content
+
+        if isinstance(data, dict) and "results" in data:
+            if response is not None:
+                self.set_pagination_headers(response, data)
+            data = data["results"]
+        elif isinstance(data, dict):
+            data = [data]
+
+        # Readings accepted for buffered ingestion have no id and creation time.
+        return b"".join(
+            self.encode_record(
+                *(item.get(field) for field in SENSOR_READING_RECORD_FIELDS)
+            )
+            for item in data
+        )
+
+    def render_rows(self, fields, rows):
+        get_record = itemgetter(*map(fields.index, SENSOR_READING_RECORD_FIELDS))
+        records = []
+
+        for i, row in enumerate(rows, 1):
+            records.append(self.encode_record(*get_record(row)))
+            if i % self.chunk_size == 0:
+                yield b"".join(records)
+                records.clear()
+
+        yield b"".join(records)
+
+    @staticmethod
+    def set_pagination_headers(response, data):
+        links = [
+            f'<{data[rel]}>; rel="{rel}"'
+            for rel in ("next", "previous")
+            if data.get(rel) is not None
+        ]
+        if links:
+            response["Link"] = ", ".join(links)
+        if "count" in data:
+            response["X-Total-Count"] = data["count"]
+
+    @staticmethod
+    def encode_record(id, hydroponic_system, created_at, ph, water_temp, tds):
+        if isinstance(created_at, str):
+            # Unlike `datetime.fromisoformat` before Python 3.11, it accepts
+            # the "Z" suffix of the serialized times.
+            created_at = parse_datetime(created_at)
+
+        return SENSOR_READING_RECORD.pack(
+            id or 0,
+            hydroponic_system,
+            (created_at - EPOCH) // timedelta(microseconds=1) if created_at else 0,
+            int(Decimal(ph).scaleb(SENSOR_READING_SCALE)),
+            int(Decimal(water_temp).scaleb(SENSOR_READING_SCALE)),
+            int(Decimal(tds).scaleb(SENSOR_READING_SCALE)),
+        )
@@ -0,0 +1,169 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from core import partitions
+from core.cache import bump_owner_versions
+from core.models import HourlySensorReadingRollup, HydroponicSystem, SensorReading
+
+
+def get_retention_days(field, default):
+    systems = HydroponicSystem.objects.values_list(
+        "id",
+        "retention_policy__id",
+        f"retention_policy__{field}",
+        "owner__retention_policy__id",
+        f"owner__retention_policy__{field}",
+    )
+
+    retention_days = {}
+    for pk, policy, days, owner_policy, owner_days in systems.iterator():
+        if policy is not None:
+            retention_days[pk] = days
+        elif owner_policy is not None:
+            retention_days[pk] = owner_days
+        else:
+            retention_days[pk] = default
+
+    return retention_days
+
+
+def get_cutoffs(retention_days, now):
+    cutoffs = defaultdict(list)
+    for pk, days in retention_days.items():
+        if days is not None:
+            cutoffs[now - timedelta(days=days)].append(pk)
+    return cutoffs
+
+
+def invalidate_owner_responses(owner_ids, using="default"):
+    # The cached responses of the hydroponic systems show their counters and
+    # statistics, so the ones of the owners are invalidated once the deletions
+    # are committed.
+    if owner_ids:
+        transaction.on_commit(lambda: bump_owner_versions(owner_ids), using=using)
+
+
+def drop_expired_partitions(retention_days, now, using="default"):
+    # A partition can only be dropped if the readings of every hydroponic
+    # system in it are expired.
+    if not retention_days or None in retention_days.values():
+        return []
+
+    table = SensorReading._meta.db_table
+    cutoff = now - timedelta(days=max(retention_days.values()))
+    dropped = []
+
+    qn = connections[using].ops.quote_name
+    system_table = HydroponicSystem._meta.db_table
+
+    for partition in partitions.get_partitions(table, using):
+        if partition.end <= cutoff:
+            # The counters are decremented in the same transaction, with the
+            # partition locked against concurrent ingestion.
+            with transaction.atomic(using=using):
+                with connections[using].cursor() as cursor:
+                    cursor.execute(f"LOCK TABLE {qn(partition.name)} IN EXCLUSIVE MODE")
+                    cursor.execute(
+                        f"UPDATE {system_table} AS system "
+                        f"SET reading_count = system.reading_count - counts.count "
+                        f"FROM (SELECT hydroponic_system_id, COUNT(*) AS count "
+                        f"FROM {qn(partition.name)} GROUP BY 1) AS counts "
+                        f"WHERE system.id = counts.hydroponic_system_id "
+                        f"RETURNING system.owner_id"
+                    )
+                    owner_ids = {owner_id for owner_id, in cursor.fetchall()}
+                partitions.drop_partition(table, partition.name, using)
+                invalidate_owner_responses(owner_ids, using)
+            dropped.append(partition)
+
+    return dropped
+
+
+def delete_expired(
+    model, column, cutoffs, batch_size, sleep=0, using="default", counter=None
+):
+    # Raw, bounded deletes in autocommit mode hold locks only for a single batch
+    # and skip the Python-side cascade collector of `QuerySet.delete()`. The
+    # `counter` column of the hydroponic systems is decremented by the same
+    # statement, which also returns their owners.
+    table = model._meta.db_table
+    sql = (
+        f"DELETE FROM {table} WHERE (id, {column}) IN ("
+        f"SELECT id, {column} FROM {table} "
+        f"WHERE hydroponic_system_id = ANY(%s) AND {column} < %s LIMIT %s"
+        f")"
+    )
+    if counter is not None:
+        system_table = HydroponicSystem._meta.db_table
+        sql = (
+            f"WITH deleted AS ({sql} RETURNING hydroponic_system_id), "
+            f"counts AS (SELECT hydroponic_system_id, COUNT(*) AS count "
+            f"FROM deleted GROUP BY 1), "
+            f"updated AS (UPDATE {system_table} AS system "
+            f"SET {counter} = system.{counter} - counts.count FROM counts "
+            f"WHERE system.id = counts.hydroponic_system_id "
+            f"RETURNING system.owner_id, counts.count) "
+            f"SELECT owner_id, count FROM updated"
+        )
+    deleted = 0
+
+    for cutoff, system_ids in cutoffs.items():
+        while True:
+            with connections[using].cursor() as cursor:
+                cursor.execute(sql, [system_ids, cutoff, batch_size])
+                if counter is None:
+                    count = cursor.rowcount
+                else:
+                    rows = cursor.fetchall()
+                    count = sum(count for _, count in rows)
+                    invalidate_owner_responses(
+                        {owner_id for owner_id, _ in rows}, using
+                    )
+
+            deleted += count
+            if count < batch_size:
+                break
+            if sleep:
+                time.sleep(sleep)
+
+    return deleted
+
+
+def enforce_retention(batch_size=10000, sleep=0, using="default"):
+    now = timezone.now()
+
+    raw_days = get_retention_days(
+        "raw_retention_days", settings.SENSOR_READING_RAW_RETENTION_DAYS
+    )
+    rollup_days = get_retention_days(
+        "hourly_rollup_retention_days",
+        settings.SENSOR_READING_HOURLY_ROLLUP_RETENTION_DAYS,
+    )
+
+    dropped_partitions = drop_expired_partitions(raw_days, now, using)
+    deleted_readings = delete_expired(
+        SensorReading,
+        "created_at",
+        get_cutoffs(raw_days, now),
+        batch_size,
+        sleep,
+        using,
+        counter="reading_count",
+    )
+    deleted_rollups = delete_expired(
+        HourlySensorReadingRollup,
+        "period_start",
+        get_cutoffs(rollup_days, now),
+        batch_size,
+        sleep,
+        using,
+    )
+
+    return {
+        "dropped_partitions": dropped_partitions,
+        "deleted_readings": deleted_readings,
+        "deleted_hourly_rollups": deleted_rollups,
+    }
@@ -0,0 +1,167 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from django.db import connections
+from core import partitions
+from core.models import (
+    DailySensorReadingRollup,
+    HourlySensorReadingRollup,
+    HydroponicSystem,
+    SensorReading,
+    User,
+)
+
+NUTRIENT_CHANGE_INTERVAL = 7 * 86400
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def generate_readings(system_id, owner_id, start, interval, count, seed):
+    # Yields the rows of a system's readings as tab separated lines for COPY.
+    # The water temperature follows a daily curve peaking in the afternoon. pH
+    # drifts up and TDS drops as the plants take up nutrients, until the
+    # solution is changed once a week. The rows only depend on the seed and the
+    # system id. Times are whole seconds, formatted from cached parts, because
+    # formatting datetimes would take most of the time.
+    rng = random.Random(f"{seed}:{system_id}")
+    base_temp = rng.uniform(18, 23)
+    temp_amplitude = rng.uniform(1, 4)
+    base_ph = rng.uniform(5.6, 6.2)
+    ph_drift = rng.uniform(0.05, 0.2) / 86400
+    base_tds = rng.uniform(700, 1200)
+    tds_uptake = rng.uniform(10, 40) / 86400
+    phase = rng.randrange(NUTRIENT_CHANGE_INTERVAL)
+
+    start_seconds = int(start.timestamp())
+    step = int(interval.total_seconds())
+    days = {}
+    times = {}
+    random_ = rng.random
+
+    for i in range(count):
+        seconds = start_seconds + step * i
+        day, second_of_day = divmod(seconds, 86400)
+        since_change = (seconds + phase) % NUTRIENT_CHANGE_INTERVAL
+
+        if day not in days:
+            days[day] = f"{EPOCH + timedelta(days=day):%Y-%m-%d} "
+        if second_of_day not in times:
+            times[second_of_day] = (
+                f"{second_of_day // 3600:02}:{second_of_day // 60 % 60:02}:"
+                f"{second_of_day % 60:02}+00"
+            )
+
+        # The sum of three uniform variables is a cheap approximation of noise.
+        noise = random_() + random_() + random_() - 1.5
+        water_temp = (
+            base_temp
+            + temp_amplitude * math.sin(2 * math.pi * (second_of_day / 86400 - 0.375))
+            + noise * 0.3
+        )
+        ph = base_ph + ph_drift * since_change + noise * 0.05
+        tds = base_tds - tds_uptake * since_change - noise * 8
+
+        yield (
+            f"{min(max(ph, 0), 14):.2f}\t{water_temp:.2f}\t{max(tds, 0):.2f}\t"
+            f"{system_id}\t{owner_id}\t{days[day]}{times[second_of_day]}\n"
+        )
+
+
+def copy_readings(systems, start, interval, count, seed, batch_size, using="default"):
+    # Streams the readings of the systems into the table with COPY, in separate
+    # statements of at most `batch_size` rows.
+    table = SensorReading._meta.db_table
+    sql = (
+        f"COPY {table} (ph, water_temp, tds, hydroponic_system_id, owner_id, "
+        f"created_at) FROM STDIN"
+    )
+    connection = connections[using]
+    batch = []
+
+    def flush():
+        with connection.cursor() as cursor:
+            with cursor.cursor.copy(sql) as copy:
+                copy.write("".join(batch))
+        batch.clear()
+
+    for system_id, owner_id in systems:
+        for row in generate_readings(system_id, owner_id, start, interval, count, seed):
+            batch.append(row)
+            if len(batch) == batch_size:
+                flush()
+    if batch:
+        flush()
+
+    return len(systems) * count
+
+
+def close_connections():
+    # Forked processes must not share connections, including pooled ones.
+    connections.close_all()
+    for connection in connections.all(initialized_only=True):
+        if hasattr(connection, "close_pool"):
+            connection.close_pool()
+
+
+def copy_readings_in_worker(args):
+    try:
+        return copy_readings(*args)
+    finally:
+        close_connections()
+
+
+def seed(
+    users,
+    systems_per_user,
+    readings_per_system,
+    interval,
+    end,
+    seed_value,
+    batch_size=100000,
+    workers=1,
+    rollups=True,
+    using="default",
+):
+    rng = random.Random(seed_value)
+    end = end.replace(microsecond=0)
+    start = end - interval * (readings_per_system - 1)
+
+    owners = User.objects.using(using).bulk_create(
+        User(username=f"seed{seed_value}_{i}") for i in range(users)
+    )
+    systems = HydroponicSystem.objects.using(using).bulk_create(
+        HydroponicSystem(
+            name=f"System {i + 1}",
+            plant_count=rng.randint(1, 20),
+            owner=owner,
+        )
+        for owner in owners
+        for i in range(systems_per_user)
+    )
+    systems = [(system.pk, system.owner_id) for system in systems]
+
+    table = SensorReading._meta.db_table
+    partitions.create_partitions(table, start, end, using=using)
+
+    args = (start, interval, readings_per_system, seed_value, batch_size, using)
+    if workers > 1:
+        # Every worker process opens its own connection.
+        close_connections()
+        chunks = [systems[i::workers] for i in range(workers)]
+        with Pool(workers) as pool:
+            created = sum(
+                pool.map(copy_readings_in_worker, [(chunk, *args) for chunk in chunks])
+            )
+    else:
+        created = copy_readings(systems, *args)
+
+    # COPY bypasses the ingestion, which maintains the counters.
+    HydroponicSystem.objects.using(using).filter(
+        pk__in=[pk for pk, _ in systems]
+    ).repair_sensor_reading_counters()
+
+    if rollups:
+        HourlySensorReadingRollup.objects.using(using).rebuild(since=start)
+        DailySensorReadingRollup.objects.using(using).rebuild(since=start)
+
+    return {"users": len(owners), "systems": len(systems), "readings": created}
@@ -1,12 +1,75 @@
-from rest_framework import serializers
-from core.models import HydroponicSystem, SensorReading
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from core.models import Alert, AlertRule, HydroponicSystem, SensorReading
+
+
+class HydroponicSystemField(serializers.PrimaryKeyRelatedField):
+    # Loads the hydroponic system with a single lookup, or none if the list
+    # serializer has already loaded the systems. Ownership is checked by the
+    # views once all the fields are validated.
+
+    def to_internal_value(self, data):
+        systems = self.context.get("hydroponic_systems")
+        if systems is None:
+            return super().to_internal_value(data)
+
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return systems[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class SensorReadingListSerializer(serializers.ListSerializer):
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.context["hydroponic_systems"] = self.get_hydroponic_systems(data)
+        return super().to_internal_value(data)
+
+    def get_hydroponic_systems(self, data):
+        systems = self.get_hydroponic_system_queryset(data)
+        return {system.pk: system for system in systems}
+
+    @staticmethod
+    def get_hydroponic_system_queryset(data):
+        pks = set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            try:
+                pks.add(int(item.get("hydroponic_system")))
+            except (TypeError, ValueError):
+                pass
+
+        return HydroponicSystem.objects.filter(pk__in=pks).only("id", "owner_id")
+
+    def create(self, validated_data):
+        readings = [SensorReading(**attrs) for attrs in validated_data]
+        return SensorReading.objects.ingest(readings, batch_size=self.batch_size)
 
 
 class SensorReadingSerializer(serializers.ModelSerializer):
+    hydroponic_system = HydroponicSystemField(
+        queryset=HydroponicSystem.objects.only("id", "owner_id")
+    )
+
     class Meta:
         model = SensorReading
         fields = ["id", "ph", "water_temp", "tds", "hydroponic_system", "created_at"]
         read_only_fields = ["id", "created_at"]
+        list_serializer_class = SensorReadingListSerializer
+
+    def create(self, validated_data):
+        return SensorReading.objects.ingest([SensorReading(**validated_data)])[0]
 
 
 class HydroponicSystemSerializer(serializers.ModelSerializer):
@@ -22,6 +85,273 @@ class HydroponicSystemSerializer(serializers.ModelSerializer):
             "description",
             "plant_count",
             "created_at",
+            "reading_count",
+            "last_reading_at",
+            "last_ph",
+            "last_water_temp",
+            "last_tds",
             "recent_sensor_readings",
         ]
         read_only_fields = ["id", "created_at"]
+
+    def update(self, instance, validated_data):
+        # Saving only the updated fields keeps the counters incremented by
+        # readings ingested since the system was loaded.
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class HydroponicSystemDashboardSerializer(HydroponicSystemSerializer):
+    # Expects the systems to be annotated by `annotate_sensor_reading_summary`.
+    sensor_reading_count = serializers.IntegerField(read_only=True)
+    latest_sensor_reading = serializers.SerializerMethodField()
+
+    class Meta(HydroponicSystemSerializer.Meta):
+        fields = [
+            "id",
+            "name",
+            "description",
+            "plant_count",
+            "created_at",
+            "sensor_reading_count",
+            "latest_sensor_reading",
+        ]
+
+    def get_latest_sensor_reading(self, system):
+        reading = system.latest_sensor_reading
+        if reading is None:
+            return None
+
+        row = {
+            name: SensorReading._meta.get_field(name).to_python(value)
+            for name, value in reading.items()
+        }
+        values_serializer = ValuesSerializer.for_serializer(SensorReadingSerializer)
+        return values_serializer.to_representation([row])[0]
+
+
+class SensorReadingAggregateQuerySerializer(serializers.Serializer):
+    BUCKETS = {
+        "1m": timedelta(minutes=1),
+        "5m": timedelta(minutes=5),
+        "15m": timedelta(minutes=15),
+        "1h": timedelta(hours=1),
+        "6h": timedelta(hours=6),
+        "1d": timedelta(days=1),
+        "7d": timedelta(days=7),
+    }
+
+    bucket = serializers.ChoiceField(choices=list(BUCKETS))
+    created_at__gte = serializers.DateTimeField(required=False)
+    created_at__lte = serializers.DateTimeField(required=False)
+
+    def validate_bucket(self, value):
+        return self.BUCKETS[value]
+
+
+class SensorReadingAggregateSerializer(serializers.Serializer):
+    hydroponic_system = serializers.IntegerField()
+    bucket = serializers.DateTimeField()
+    count = serializers.IntegerField()
+    ph_min = serializers.DecimalField(max_digits=4, decimal_places=2)
+    ph_max = serializers.DecimalField(max_digits=4, decimal_places=2)
+    ph_avg = serializers.DecimalField(max_digits=None, decimal_places=2)
+    water_temp_min = serializers.DecimalField(max_digits=5, decimal_places=2)
+    water_temp_max = serializers.DecimalField(max_digits=5, decimal_places=2)
+    water_temp_avg = serializers.DecimalField(max_digits=None, decimal_places=2)
+    tds_min = serializers.DecimalField(max_digits=7, decimal_places=2)
+    tds_max = serializers.DecimalField(max_digits=7, decimal_places=2)
+    tds_avg = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+
+class SensorReadingStatsQuerySerializer(serializers.Serializer):
+    created_at__gte = serializers.DateTimeField(required=False)
+    created_at__lte = serializers.DateTimeField(required=False)
+    ph_target_min = serializers.DecimalField(4, 2, required=False)
+    ph_target_max = serializers.DecimalField(4, 2, required=False)
+    water_temp_target_min = serializers.DecimalField(5, 2, required=False)
+    water_temp_target_max = serializers.DecimalField(5, 2, required=False)
+    tds_target_min = serializers.DecimalField(7, 2, required=False)
+    tds_target_max = serializers.DecimalField(7, 2, required=False)
+
+    def validate(self, attrs):
+        target_ranges = {}
+        for metric in SensorReading.METRICS:
+            low, high = settings.SENSOR_READING_TARGET_RANGES[metric]
+            low = attrs.pop(f"{metric}_target_min", Decimal(low))
+            high = attrs.pop(f"{metric}_target_max", Decimal(high))
+            if low > high:
+                raise serializers.ValidationError(
+                    {f"{metric}_target_min": "Must not be greater than the maximum."}
+                )
+            target_ranges[metric] = (low, high)
+
+        attrs["target_ranges"] = target_ranges
+        return attrs
+
+
+class MetricStatsSerializer(serializers.Serializer):
+    mean = serializers.DecimalField(max_digits=None, decimal_places=2)
+    stddev = serializers.DecimalField(max_digits=None, decimal_places=2)
+    p5 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    p50 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    p95 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    target_min = serializers.DecimalField(max_digits=None, decimal_places=2)
+    target_max = serializers.DecimalField(max_digits=None, decimal_places=2)
+    time_in_range = serializers.DecimalField(max_digits=None, decimal_places=4)
+
+
+class SensorReadingStatsSerializer(serializers.Serializer):
+    hydroponic_system = serializers.IntegerField()
+    count = serializers.IntegerField()
+    ph = MetricStatsSerializer()
+    water_temp = MetricStatsSerializer()
+    tds = MetricStatsSerializer()
+
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    hydroponic_system = HydroponicSystemField(
+        queryset=HydroponicSystem.objects.only("id", "owner_id")
+    )
+    stddev = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = AlertRule
+        fields = [
+            "id",
+            "hydroponic_system",
+            "metric",
+            "min_value",
+            "max_value",
+            "window",
+            "max_deviation",
+            "count",
+            "mean",
+            "stddev",
+            "created_at",
+        ]
+        read_only_fields = ["id", "count", "mean", "created_at"]
+        extra_kwargs = {"max_deviation": {"min_value": Decimal("0.01")}}
+
+    def validate(self, attrs):
+        def get(name):
+            if name in attrs:
+                return attrs[name]
+            return getattr(self.instance, name, None)
+
+        min_value, max_value = get("min_value"), get("max_value")
+        if min_value is None and max_value is None:
+            raise serializers.ValidationError(
+                "At least one of min_value and max_value is required."
+            )
+        if min_value is not None and max_value is not None and min_value > max_value:
+            raise serializers.ValidationError(
+                {"min_value": "Must not be greater than max_value."}
+            )
+        return attrs
+
+    def update(self, instance, validated_data):
+        # The rolling statistics only make sense for the same readings.
+        if any(
+            name in validated_data and validated_data[name] != getattr(instance, name)
+            for name in ("hydroponic_system", "metric", "window")
+        ):
+            instance.reset()
+        return super().update(instance, validated_data)
+
+
+class AlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Alert
+        fields = [
+            "id",
+            "rule",
+            "hydroponic_system",
+            "kind",
+            "metric",
+            "value",
+            "mean",
+            "stddev",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+
+class ValuesSerializer:
+    # Serializes rows returned by `QuerySet.values()` exactly like the given
+    # model serializer serializes instances, but without instantiating models and
+    # with converters resolved once per call instead of once per value. Fields
+    # that are not concrete model fields are left out, like the serializer does
+    # for optional fields missing from the instance.
+    _cache = {}
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.fields = []
+
+        for field in serializer_class()._readable_fields:
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete:
+                self.fields.append(field)
+
+        self.sources = [field.source for field in self.fields]
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        if serializer_class not in cls._cache:
+            cls._cache[serializer_class] = cls(serializer_class)
+        return cls._cache[serializer_class]
+
+    def get_converter(self, field):
+        if type(field) in (serializers.IntegerField, serializers.CharField):
+            return None
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return None if field.pk_field is None else field.pk_field.to_representation
+
+        if isinstance(field, serializers.DecimalField):
+            coerce_to_string = getattr(
+                field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+            )
+            # Values read from the database already have the field's scale.
+            if coerce_to_string and not field.localize:
+                return "{:f}".format
+
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+            tz = getattr(field, "timezone", None) or field.default_timezone()
+
+            if tz is not None and str(output_format).lower() == ISO_8601:
+
+                def convert_datetime(value):
+                    value = value.astimezone(tz).isoformat()
+                    if value.endswith("+00:00"):
+                        value = value[:-6] + "Z"
+                    return value
+
+                return convert_datetime
+
+        return field.to_representation
+
+    def to_representation(self, rows):
+        converters = [
+            (field.field_name, field.source, self.get_converter(field))
+            for field in self.fields
+        ]
+
+        return [
+            {
+                name: (
+                    row[source]
+                    if convert is None or row[source] is None
+                    else convert(row[source])
+                )
+                for name, source, convert in converters
+            }
+            for row in rows
+        ]
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with the `readings` argument after sensor readings are inserted, inside
+# the inserting transaction.
+sensor_readings_created = Signal()
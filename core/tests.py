@@ -1,10 +1,62 @@
+import asyncio
+import io
+import json
+import time
 import urllib.parse
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import test
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from core.async_views import stream_sensor_readings
+from core.buffer import get_buffer
+from core.cache import (
+    get_owner_version,
+    get_owner_version_key,
+    get_token_auth_key,
+    pin_owners_to_primary,
+)
+from core.checks import check_response_cache, check_session_cache
+from core.db.routers import get_replica, reads_from
+from core.live import (
+    PAYLOAD_MAX_SIZE,
+    SensorReadingHub,
+    Subscription,
+    encode_notifications,
+)
 from core.factories import HydroponicSystemFactory, SensorReadingFactory, UserFactory
-
-
+from core.middleware import QueryBudgetMiddleware, get_query_budget, get_view_name
+from core.models import (
+    Alert,
+    AlertRule,
+    DailySensorReadingRollup,
+    HourlySensorReadingRollup,
+    HydroponicSystem,
+    RetentionPolicy,
+    SensorReading,
+)
+from core.partitions import create_partitions, get_partitions
+from core.renderers import EPOCH, SENSOR_READING_MEDIA_TYPE, SENSOR_READING_RECORD
+from core.seeding import generate_readings
+from core.serializers import HydroponicSystemSerializer, SensorReadingSerializer
+
+
+# Reads are routed to replicas only in the tests of the routing.
+@override_settings(DATABASE_REPLICAS=[])
 class APITestCase(test.APITestCase):
     def request(
         self,
@@ -22,7 +74,27 @@ class APITestCase(test.APITestCase):
 
         self.client.force_authenticate(user=user)
 
-        return getattr(self.client, method)(url, data=data)
+        # The callbacks run when the request is committed outside of tests.
+        with (
+            self.captureOnCommitCallbacks(execute=True),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            response = getattr(self.client, method)(url, data=data)
+
+        self.assertWithinQueryBudget(response, queries)
+        return response
+
+    def assertWithinQueryBudget(self, response, queries):
+        view_name = get_view_name(
+            response.resolver_match, response.request["REQUEST_METHOD"]
+        )
+        budget = get_query_budget(view_name)
+        if budget is not None and len(queries) > budget:
+            self.fail(
+                f"{view_name} made {len(queries)} queries, over the budget of "
+                f"{budget}:\n"
+                + "\n".join(query["sql"] for query in queries.captured_queries)
+            )
 
 
 class TestHydroponicSystems(APITestCase):
@@ -191,6 +263,48 @@ class TestHydroponicSystems(APITestCase):
             [system.id for system in self.systems[:3]],
         )
 
+    def test_hydroponic_system_dashboard(self):
+        query_params = {"mode": "dashboard", "ordering": "created_at"}
+        response = self.request(
+            "get", "hydroponic-system-list", query_params=query_params
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        latest = SensorReadingFactory(
+            hydroponic_system=self.systems[0],
+            created_at=timezone.now() + timedelta(days=1),
+            ph=Decimal("6.1"),
+        )
+        response = self.request(
+            "get",
+            "hydroponic-system-list",
+            query_params={**query_params, "page_size": 2},
+            user=self.users[0],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 3)
+        self.assertIsNotNone(data["next"])
+
+        results = data["results"]
+        self.assertListEqual(
+            [system["id"] for system in results],
+            [self.systems[0].id, self.systems[1].id],
+        )
+        self.assertEqual(results[0]["name"], "system1")
+        self.assertEqual(results[0]["sensor_reading_count"], 16)
+        self.assertDictEqual(
+            results[0]["latest_sensor_reading"],
+            SensorReadingSerializer(SensorReading.objects.get(pk=latest.pk)).data,
+        )
+        self.assertEqual(results[0]["latest_sensor_reading"]["ph"], "6.10")
+        self.assertNotIn("recent_sensor_readings", results[0])
+        self.assertEqual(results[1]["sensor_reading_count"], 0)
+        self.assertIsNone(results[1]["latest_sensor_reading"])
+
+        response = self.request("get", "hydroponic-system-list", user=self.users[0])
+        self.assertNotIn("sensor_reading_count", response.json()["results"][0])
+
     def test_hydroponic_system_create(self):
         def request_and_check_status(
             data=None, user=None, status_code=status.HTTP_201_CREATED
@@ -288,6 +402,99 @@ class TestHydroponicSystems(APITestCase):
         request_and_check_status(system, self.users[0])
         self.assertEqual(self.users[0].hydroponic_systems.count(), 2)
 
+    def test_hydroponic_system_cache(self):
+        cache.clear()
+        system = self.systems[0]
+        self.client.force_authenticate(user=self.users[0])
+        list_url = reverse("hydroponic-system-list")
+        detail_url = reverse("hydroponic-system-detail", kwargs={"pk": system.pk})
+
+        response = self.client.get(detail_url)
+        etag = response["ETag"]
+        data = response.json()
+        with self.assertNumQueries(0):
+            response = self.client.get(detail_url)
+            self.assertEqual(response.json(), data)
+            self.assertEqual(response["ETag"], etag)
+            response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(list_url, {"ordering": "name", "name": "system1"})
+        list_etag = response["ETag"]
+        response = self.client.get(list_url, {"name": "system1", "ordering": "name"})
+        self.assertEqual(response["ETag"], list_etag)
+        response = self.client.get(list_url, {"name": "system2", "ordering": "name"})
+        self.assertNotEqual(response["ETag"], list_etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SensorReadingFactory(hydroponic_system=system, created_at=timezone.now())
+            # The version is only bumped once the reading is committed.
+            response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertNotEqual(response.json(), data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url, {"name": "renamed"})
+        response = self.client.get(list_url, {"ordering": "name", "name": "system1"})
+        self.assertNotEqual(response["ETag"], list_etag)
+        self.assertEqual(response.json()["count"], 0)
+
+        self.client.force_authenticate(user=self.users[1])
+        response = self.client.get(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_hydroponic_system_cache_eviction(self):
+        cache.clear()
+        system = self.systems[0]
+        self.client.force_authenticate(user=self.users[0])
+        detail_url = reverse("hydroponic-system-detail", kwargs={"pk": system.pk})
+        version_key = get_owner_version_key(self.users[0].pk)
+
+        cache.delete(version_key)
+        response = self.client.get(detail_url)
+        etag = response["ETag"]
+        self.assertEqual(response.json()["reading_count"], 15)
+
+        SensorReadingFactory(hydroponic_system=system)
+        cache.delete(version_key)
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["reading_count"], 16)
+
+        with self.settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            }
+        ):
+            self.assertListEqual(
+                [warning.id for warning in check_response_cache(None)], ["core.W001"]
+            )
+        with self.settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}
+            }
+        ):
+            self.assertListEqual(check_response_cache(None), [])
+
+    def test_session_cache_check(self):
+        self.assertListEqual(check_session_cache(None), [])
+        with self.settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db"):
+            self.assertListEqual(
+                [error.id for error in check_session_cache(None)], ["core.E002"]
+            )
+            with self.settings(
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.redis.RedisCache"
+                    }
+                }
+            ):
+                self.assertListEqual(check_session_cache(None), [])
+
 
 class TestSensorReadings(APITestCase):
     def setUp(self):
@@ -538,6 +745,15 @@ class TestSensorReadings(APITestCase):
             status_code=status.HTTP_403_FORBIDDEN,
             text="You are not the owner of the hydroponic system.",
         )
+        # The system is loaded once, and the other fields are validated before
+        # its ownership is checked.
+        with self.assertNumQueries(1):
+            request_and_check_status(
+                {**data, "ph": "invalid"},
+                self.users[1],
+                status_code=status.HTTP_400_BAD_REQUEST,
+                text="ph",
+            )
 
         self.assertEqual(system.sensor_readings.count(), 2)
         request_and_check_status(data, self.users[0])
@@ -548,3 +764,1475 @@ class TestSensorReadings(APITestCase):
 
         data["hydroponic_system"] = 999
         request_and_check_status(data, self.users[0], status.HTTP_400_BAD_REQUEST)
+
+    def test_sensor_reading_bulk_create(self):
+        def request_and_check_status(
+            data=None, user=None, status_code=status.HTTP_201_CREATED
+        ):
+            response = self.request("post", "sensor-reading-bulk", data=data, user=user)
+            self.assertEqual(response.status_code, status_code)
+            return response.json() if response.content else None
+
+        request_and_check_status(status_code=status.HTTP_401_UNAUTHORIZED)
+
+        data = [
+            {
+                "ph": "3.7",
+                "water_temp": "20.1",
+                "tds": "400.5",
+                "hydroponic_system": system.id,
+            }
+            for system in self.systems[:2] * 3
+        ]
+
+        request_and_check_status([], self.users[0], status.HTTP_400_BAD_REQUEST)
+        request_and_check_status(data[0], self.users[0], status.HTTP_400_BAD_REQUEST)
+
+        with self.assertNumQueries(8):
+            response = request_and_check_status(data, self.users[0])
+        self.assertEqual(response["created"], 6)
+        self.assertEqual(self.systems[0].sensor_readings.count(), 5)
+        self.assertEqual(self.systems[1].sensor_readings.count(), 4)
+
+        data[3]["hydroponic_system"] = self.systems[2].id
+        response = request_and_check_status(
+            data, self.users[0], status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            response, {"detail": "You are not the owner of the hydroponic system."}
+        )
+
+        data[1]["ph"] = "invalid"
+        data[5]["hydroponic_system"] = 999
+        with self.assertNumQueries(1):
+            errors = request_and_check_status(
+                data, self.users[0], status.HTTP_400_BAD_REQUEST
+            )
+        self.assertEqual(len(errors), 6)
+        self.assertEqual(errors[0], {})
+        self.assertIn("ph", errors[1])
+        self.assertEqual(errors[3], {})
+        self.assertIn("hydroponic_system", errors[5])
+        self.assertEqual(self.systems[0].sensor_readings.count(), 5)
+
+    def test_sensor_reading_list_cursor_pagination(self):
+        system = self.systems[1]
+        SensorReadingFactory.create_batch(
+            44, hydroponic_system=system, created_at="2024-06-04T14:00:00Z"
+        )
+        expected = list(
+            system.sensor_readings.order_by("created_at", "id").values_list(
+                "id", flat=True
+            )
+        )
+
+        def collect(query_params, link="next"):
+            self.client.force_authenticate(user=self.users[0])
+            url = reverse("sensor-reading-list")
+            url = f"{url}?{urllib.parse.urlencode(query_params)}"
+            pages = []
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                data = response.json()
+                self.assertNotIn("count", data)
+                pages.append([reading["id"] for reading in data["results"]])
+                url = data[link]
+            return pages
+
+        query_params = {"pagination": "cursor", "hydroponic_system": system.id}
+        pages = collect(query_params)
+        self.assertListEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertListEqual(sum(pages, []), expected)
+
+        query_params["ordering"] = "-created_at"
+        pages = collect(query_params)
+        self.assertListEqual(sum(pages, []), expected[::-1])
+
+        query_params["ordering"] = "ph"
+        pages = collect(query_params)
+        readings = system.sensor_readings.order_by("ph", "id")
+        self.assertListEqual(sum(pages, []), [reading.id for reading in readings])
+
+        self.client.force_authenticate(user=self.users[0])
+        response = self.client.get(
+            reverse("sensor-reading-list"),
+            {"pagination": "cursor", "hydroponic_system": system.id},
+        )
+        response = self.client.get(response.json()["next"])
+        previous = response.json()["previous"]
+        response = self.client.get(previous)
+        data = response.json()
+        self.assertListEqual(
+            [reading["id"] for reading in data["results"]], expected[:20]
+        )
+        self.assertIsNone(data["previous"])
+
+        response = self.client.get(
+            reverse("sensor-reading-list"), {"cursor": "invalid"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(reverse("sensor-reading-list"))
+        self.assertEqual(response.json()["count"], 47)
+
+    def test_sensor_reading_list_values(self):
+        SensorReadingFactory.create_batch(
+            30, hydroponic_system=self.systems[0], created_at="2024-06-04T14:00:00.5Z"
+        )
+        SensorReadingFactory(
+            ph="7.10", hydroponic_system=self.systems[0], created_at="2024-06-05T00:00Z"
+        )
+        self.client.force_authenticate(user=self.users[0])
+
+        for query_params in [{}, {"pagination": "cursor"}, {"ordering": "-ph"}]:
+            query_params["page_size"] = 50
+            response = self.client.get(reverse("sensor-reading-list"), query_params)
+            data = response.json()
+            ids = [reading["id"] for reading in data["results"]]
+            readings = SensorReading.objects.in_bulk(ids)
+            readings = [readings[id] for id in ids]
+            data["results"] = SensorReadingSerializer(readings, many=True).data
+            self.assertEqual(len(readings), 34)
+            self.assertEqual(response.content, JSONRenderer().render(data))
+
+        response = self.client.get(
+            reverse("hydroponic-system-list"), {"ordering": "name"}
+        )
+        data = response.json()
+        systems = self.users[0].hydroponic_systems.order_by("name", "id")
+        data["results"] = HydroponicSystemSerializer(systems, many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+        response = self.client.get(reverse("sensor-reading-list"), {"page_size": 5})
+        self.assertEqual(len(response.json()["results"]), 5)
+        response = self.client.get(
+            reverse("sensor-reading-list"), {"page_size": 100000}
+        )
+        self.assertEqual(len(response.json()["results"]), 34)
+
+    @override_settings(
+        SENSOR_READING_BUFFER_ENABLED=True,
+        SENSOR_READING_BUFFER_MAX_SIZE=2,
+        SENSOR_READING_BUFFER_FLUSH_INTERVAL=3600,
+        SENSOR_READING_BUFFER_BLOCK_TIMEOUT=0,
+    )
+    def test_sensor_reading_buffered_create(self):
+        data = {
+            "ph": "3.7",
+            "water_temp": "20.1",
+            "tds": "400.5",
+            "hydroponic_system": self.systems[1].id,
+        }
+
+        def request(data, status_code):
+            response = self.request(
+                "post", "sensor-reading-list", data=data, user=self.users[0]
+            )
+            self.assertEqual(response.status_code, status_code)
+            return response
+
+        response = request(data, status.HTTP_202_ACCEPTED)
+        created_at = response.json()["created_at"]
+        self.assertEqual(
+            response.json(),
+            {
+                "id": None,
+                "ph": "3.70",
+                "water_temp": "20.10",
+                "tds": "400.50",
+                "hydroponic_system": self.systems[1].id,
+                "created_at": created_at,
+            },
+        )
+        request({**data, "ph": "invalid"}, status.HTTP_400_BAD_REQUEST)
+        request(
+            {**data, "hydroponic_system": self.systems[2].id},
+            status.HTTP_403_FORBIDDEN,
+        )
+        request(data, status.HTTP_202_ACCEPTED)
+        response = request(data, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "3600")
+        self.assertEqual(self.systems[1].sensor_readings.count(), 1)
+
+        get_buffer().flush()
+        self.assertEqual(self.systems[1].sensor_readings.count(), 3)
+        self.assertTrue(
+            self.systems[1]
+            .sensor_readings.filter(created_at=parse_datetime(created_at))
+            .exists()
+        )
+        rollups = HourlySensorReadingRollup.objects.filter(
+            hydroponic_system=self.systems[1]
+        )
+        self.assertEqual(sum(rollup.count for rollup in rollups), 3)
+
+        # Readings added after the buffer is closed are inserted right away.
+        buffer = get_buffer()
+        buffer.close()
+        request(data, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.systems[1].sensor_readings.count(), 4)
+        self.assertListEqual(buffer.readings, [])
+
+    def test_sensor_reading_async(self):
+        url = reverse("sensor-reading-async-list")
+        data = {
+            "ph": "3.7",
+            "water_temp": "20.1",
+            "tds": "400.5",
+            "hydroponic_system": self.systems[1].id,
+        }
+
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        token = Token.objects.create(user=self.users[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reading = SensorReading.objects.get(id=response.json()["id"])
+        self.assertEqual(reading.owner, self.users[0])
+        self.assertEqual(response.json()["ph"], "3.70")
+
+        # Invalid requests get the same responses as from the sync view.
+        for invalid_data in [
+            {**data, "hydroponic_system": self.systems[2].id},
+            {**data, "hydroponic_system": 0},
+            {**data, "hydroponic_system": "invalid"},
+            {**data, "ph": "invalid"},
+        ]:
+            response = self.client.post(url, invalid_data)
+            sync_response = self.client.post(
+                reverse("sensor-reading-list"), invalid_data
+            )
+            self.assertGreaterEqual(response.status_code, 400)
+            self.assertEqual(response.status_code, sync_response.status_code)
+            self.assertEqual(response.json(), sync_response.json())
+        response = self.client.put(url, data)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        query_params = {
+            "ordering": "-created_at",
+            "hydroponic_system": self.systems[0].id,
+            "page_size": 1,
+        }
+        response = self.client.get(url, query_params)
+        sync_response = self.client.get(
+            reverse("sensor-reading-list"), {**query_params, "pagination": "cursor"}
+        )
+        self.assertEqual(response.json()["results"], sync_response.json()["results"])
+        self.assertEqual(len(response.json()["results"]), 1)
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(response.json()["results"][0]["id"], self.readings[0].id)
+        response = self.client.get(url, {"ph": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sensor_reading_owner(self):
+        for reading in self.readings:
+            self.assertEqual(reading.owner, reading.hydroponic_system.owner)
+
+        data = {
+            "ph": "3.7",
+            "water_temp": "20.1",
+            "tds": "400.5",
+            "hydroponic_system": self.systems[1].id,
+        }
+        response = self.request(
+            "post", "sensor-reading-list", data=data, user=self.users[0]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.request(
+            "post", "sensor-reading-bulk", data=[data, data], user=self.users[0]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.users[0].sensor_readings.count(), 6)
+        self.assertEqual(self.users[1].sensor_readings.count(), 2)
+
+    def test_sensor_reading_aggregate(self):
+        def request_and_check_status(
+            query_params=None, user=None, status_code=status.HTTP_200_OK
+        ):
+            response = self.request(
+                "get", "sensor-reading-aggregate", query_params=query_params, user=user
+            )
+            self.assertEqual(response.status_code, status_code)
+            return response.json() if status_code == status.HTTP_200_OK else response
+
+        request_and_check_status(status_code=status.HTTP_401_UNAUTHORIZED)
+        request_and_check_status({}, self.users[0], status.HTTP_400_BAD_REQUEST)
+        request_and_check_status(
+            {"bucket": "2h"}, self.users[0], status.HTTP_400_BAD_REQUEST
+        )
+
+        results = request_and_check_status({"bucket": "1h"}, self.users[0])
+        self.assertListEqual(
+            results,
+            [
+                {
+                    "hydroponic_system": self.systems[0].id,
+                    "bucket": "2024-06-04T13:00:00Z",
+                    "count": 2,
+                    "ph_min": "2.00",
+                    "ph_max": "8.00",
+                    "ph_avg": "5.00",
+                    "water_temp_min": "20.00",
+                    "water_temp_max": "25.00",
+                    "water_temp_avg": "22.50",
+                    "tds_min": "300.00",
+                    "tds_max": "400.00",
+                    "tds_avg": "350.00",
+                },
+                {
+                    "hydroponic_system": self.systems[1].id,
+                    "bucket": "2024-06-04T13:00:00Z",
+                    "count": 1,
+                    "ph_min": "10.00",
+                    "ph_max": "10.00",
+                    "ph_avg": "10.00",
+                    "water_temp_min": "18.00",
+                    "water_temp_max": "18.00",
+                    "water_temp_avg": "18.00",
+                    "tds_min": "100.00",
+                    "tds_max": "100.00",
+                    "tds_avg": "100.00",
+                },
+            ],
+        )
+
+        query_params = {"bucket": "5m", "hydroponic_system": self.systems[0].id}
+        results = request_and_check_status(query_params, self.users[0])
+        self.assertListEqual(
+            [(result["bucket"], result["count"]) for result in results],
+            [("2024-06-04T13:00:00Z", 1), ("2024-06-04T13:05:00Z", 1)],
+        )
+
+        query_params = {
+            "bucket": "1d",
+            "created_at__gte": "2024-06-04T13:01:00Z",
+            "ordering": "-ph",
+        }
+        results = request_and_check_status(query_params, self.users[1])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["bucket"], "2024-06-04T00:00:00Z")
+        self.assertEqual(results[0]["count"], 2)
+
+    def test_sensor_reading_stats(self):
+        def request_and_check_status(
+            system, query_params=None, user=None, status_code=status.HTTP_200_OK
+        ):
+            response = self.request(
+                "get",
+                "hydroponic-system-stats",
+                view_kwargs={"pk": system.pk},
+                query_params=query_params,
+                user=user,
+            )
+            self.assertEqual(response.status_code, status_code)
+            return response.json() if status_code == status.HTTP_200_OK else response
+
+        request_and_check_status(
+            self.systems[0], status_code=status.HTTP_401_UNAUTHORIZED
+        )
+        request_and_check_status(
+            self.systems[2], user=self.users[0], status_code=status.HTTP_404_NOT_FOUND
+        )
+        request_and_check_status(
+            self.systems[0],
+            {"ph_target_min": "7.00", "ph_target_max": "6.00"},
+            self.users[0],
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+        stats = request_and_check_status(self.systems[0], user=self.users[0])
+        self.assertDictEqual(
+            stats,
+            {
+                "hydroponic_system": self.systems[0].id,
+                "count": 2,
+                "ph": {
+                    "mean": "5.00",
+                    "stddev": "4.24",
+                    "p5": "2.30",
+                    "p50": "5.00",
+                    "p95": "7.70",
+                    "target_min": "5.50",
+                    "target_max": "6.50",
+                    "time_in_range": "0.0000",
+                },
+                "water_temp": {
+                    "mean": "22.50",
+                    "stddev": "3.54",
+                    "p5": "20.25",
+                    "p50": "22.50",
+                    "p95": "24.75",
+                    "target_min": "18.00",
+                    "target_max": "24.00",
+                    "time_in_range": "0.5000",
+                },
+                "tds": {
+                    "mean": "350.00",
+                    "stddev": "70.71",
+                    "p5": "305.00",
+                    "p50": "350.00",
+                    "p95": "395.00",
+                    "target_min": "560.00",
+                    "target_max": "1400.00",
+                    "time_in_range": "0.0000",
+                },
+            },
+        )
+
+        query_params = {
+            "created_at__gte": "2024-06-04T13:01:00Z",
+            "ph_target_min": "7.00",
+            "ph_target_max": "9.00",
+        }
+        stats = request_and_check_status(self.systems[0], query_params, self.users[0])
+        self.assertEqual(stats["count"], 1)
+        self.assertEqual(stats["ph"]["mean"], "8.00")
+        self.assertIsNone(stats["ph"]["stddev"])
+        self.assertEqual(stats["ph"]["time_in_range"], "1.0000")
+
+        query_params = {"created_at__lte": "2024-06-04T12:00:00Z"}
+        stats = request_and_check_status(self.systems[0], query_params, self.users[0])
+        self.assertEqual(stats["count"], 0)
+        self.assertIsNone(stats["tds"]["mean"])
+        self.assertIsNone(stats["tds"]["p50"])
+        self.assertIsNone(stats["tds"]["time_in_range"])
+
+    def test_sensor_reading_rollups(self):
+        rollups = HourlySensorReadingRollup.objects.get(
+            hydroponic_system=self.systems[0]
+        )
+        self.assertEqual(rollups.count, 2)
+        self.assertEqual(rollups.ph_sum, Decimal("10.00"))
+
+        data = {
+            "ph": "12.00",
+            "water_temp": "20.10",
+            "tds": "400.50",
+            "hydroponic_system": self.systems[0].id,
+        }
+        self.request("post", "sensor-reading-list", data=data, user=self.users[0])
+        self.request("post", "sensor-reading-bulk", data=[data], user=self.users[0])
+
+        rollups = DailySensorReadingRollup.objects.filter(
+            hydroponic_system=self.systems[0]
+        ).order_by("period_start")
+        self.assertListEqual([rollup.count for rollup in rollups], [2, 2])
+        self.assertEqual(rollups[1].ph_sum, Decimal("24.00"))
+        self.assertEqual(rollups[1].ph_max, Decimal("12.00"))
+
+        HourlySensorReadingRollup.objects.all().delete()
+        DailySensorReadingRollup.objects.update(count=0)
+        # Every day is rebuilt in a separate transaction.
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "rebuild_sensor_reading_rollups",
+                since="2024-06-02T00:00:00Z",
+                until="2024-06-05T00:00:00Z",
+                stdout=io.StringIO(),
+            )
+        locks = [query for query in queries if query["sql"].startswith("LOCK")]
+        self.assertEqual(len(locks), 6)
+        self.assertEqual(HourlySensorReadingRollup.objects.count(), 3)
+
+        call_command("rebuild_sensor_reading_rollups", stdout=io.StringIO())
+        self.assertEqual(HourlySensorReadingRollup.objects.count(), 4)
+        rollups = DailySensorReadingRollup.objects.filter(
+            hydroponic_system=self.systems[0]
+        ).order_by("period_start")
+        self.assertListEqual([rollup.count for rollup in rollups], [2, 2])
+
+        query_params = {
+            "bucket": "1h",
+            "created_at__gte": "2024-06-04T12:30:00Z",
+            "created_at__lte": "2024-06-04T14:00:00Z",
+        }
+        response = self.request(
+            "get",
+            "sensor-reading-aggregate",
+            query_params=query_params,
+            user=self.users[0],
+        )
+        self.assertListEqual(
+            [(row["count"], row["ph_avg"]) for row in response.json()],
+            [(2, "5.00"), (1, "10.00")],
+        )
+
+    def test_sensor_reading_counters(self):
+        def get_counters(system):
+            system.refresh_from_db()
+            return (
+                system.reading_count,
+                system.last_reading_at and system.last_reading_at.isoformat(),
+                system.last_ph,
+            )
+
+        def list_systems(query_params):
+            response = self.request(
+                "get",
+                "hydroponic-system-list",
+                query_params=query_params,
+                user=self.users[0],
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [system["id"] for system in response.json()["results"]]
+
+        system = self.systems[0]
+        self.assertTupleEqual(
+            get_counters(system), (2, "2024-06-04T13:05:00+00:00", Decimal("8.00"))
+        )
+
+        # An older reading is counted without replacing the last values.
+        SensorReading.objects.ingest(
+            [
+                SensorReading(
+                    ph="6.50",
+                    water_temp="20.00",
+                    tds="300.00",
+                    hydroponic_system=system,
+                    created_at="2024-06-04T12:00:00Z",
+                )
+            ]
+        )
+        self.assertTupleEqual(
+            get_counters(system), (3, "2024-06-04T13:05:00+00:00", Decimal("8.00"))
+        )
+
+        data = {
+            "ph": "6.1",
+            "water_temp": "21",
+            "tds": "350",
+            "hydroponic_system": system.pk,
+        }
+        response = self.request(
+            "post", "sensor-reading-list", data=data, user=self.users[0]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        count, last_reading_at, last_ph = get_counters(system)
+        self.assertEqual(count, 4)
+        self.assertEqual(
+            last_reading_at, response.json()["created_at"].replace("Z", "+00:00")
+        )
+        self.assertEqual(last_ph, Decimal("6.10"))
+
+        # Updating a system loaded before readings were ingested keeps them.
+        stale = HydroponicSystem.objects.get(pk=self.systems[1].pk)
+        SensorReadingFactory(hydroponic_system=self.systems[1])
+        serializer = HydroponicSystemSerializer(stale, data={"name": "x"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(get_counters(self.systems[1])[0], 2)
+
+        silent = HydroponicSystemFactory(owner=self.users[0])
+        query_params = {"last_reading_at__lte": "2024-06-04T14:00:00Z"}
+        self.assertListEqual(list_systems(query_params), [])
+        query_params = {"last_reading_at__gte": "2024-06-04T14:00:00Z"}
+        self.assertCountEqual(
+            list_systems(query_params), [system.pk, self.systems[1].pk]
+        )
+        self.assertListEqual(
+            list_systems({"last_reading_at__isnull": True}), [silent.pk]
+        )
+        self.assertListEqual(list_systems({"reading_count__gte": 3}), [system.pk])
+        self.assertListEqual(
+            list_systems({"ordering": "-reading_count"}),
+            [system.pk, self.systems[1].pk, silent.pk],
+        )
+
+        HydroponicSystem.objects.update(
+            reading_count=0, last_reading_at=None, last_ph=None
+        )
+        output = io.StringIO()
+        version = get_owner_version(system.owner_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "repair_hydroponic_system_counters", system=[system.pk], stdout=output
+            )
+        self.assertNotEqual(get_owner_version(system.owner_id), version)
+        self.assertIn(
+            "Repaired the counters of 1 hydroponic systems.", output.getvalue()
+        )
+        self.assertTupleEqual(
+            get_counters(system), (4, last_reading_at, Decimal("6.10"))
+        )
+        self.assertEqual(get_counters(self.systems[1])[0], 0)
+
+        call_command("repair_hydroponic_system_counters", stdout=output)
+        self.assertEqual(get_counters(self.systems[1])[0], 2)
+        self.assertTupleEqual(get_counters(silent), (0, None, None))
+
+    def test_sensor_reading_export(self):
+        def request_and_check_status(
+            query_params=None, user=None, status_code=status.HTTP_200_OK
+        ):
+            response = self.request(
+                "get", "sensor-reading-export", query_params=query_params, user=user
+            )
+            self.assertEqual(response.status_code, status_code)
+            if status_code == status.HTTP_200_OK:
+                return b"".join(response.streaming_content).decode()
+            return response
+
+        request_and_check_status(status_code=status.HTTP_401_UNAUTHORIZED)
+        for format in ["csv", "ndjson"]:
+            response = request_and_check_status(
+                {"ph": "invalid", "format": format},
+                self.users[0],
+                status.HTTP_400_BAD_REQUEST,
+            )
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertListEqual(list(response.json()), ["ph"])
+
+        content = request_and_check_status(user=self.users[1])
+        self.assertEqual(
+            content,
+            "id,ph,water_temp,tds,hydroponic_system,created_at\r\n"
+            f"{self.readings[3].id},4.00,20.00,300.00,{self.systems[2].id},"
+            "2024-06-04T13:01:00Z\r\n"
+            f"{self.readings[4].id},5.00,20.00,300.00,{self.systems[2].id},"
+            "2024-06-04T13:03:00Z\r\n",
+        )
+
+        query_params = {"ph__gte": 5, "ordering": "-created_at"}
+        content = request_and_check_status(
+            {**query_params, "format": "ndjson"}, self.users[0]
+        )
+        lines = [json.loads(line) for line in content.splitlines()]
+        list_results = self.request(
+            "get", "sensor-reading-list", query_params=query_params, user=self.users[0]
+        )
+        self.assertListEqual(lines, list_results.json()["results"])
+
+    def test_sensor_reading_binary(self):
+        self.client.force_authenticate(user=self.users[0])
+        record = SENSOR_READING_RECORD.pack(0, self.systems[1].id, 0, 710, 2150, 40050)
+
+        response = self.client.post(
+            reverse("sensor-reading-list"),
+            record,
+            content_type=SENSOR_READING_MEDIA_TYPE,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["ph"], "7.10")
+        self.assertEqual(response.json()["water_temp"], "21.50")
+        self.assertEqual(response.json()["tds"], "400.50")
+
+        response = self.client.post(
+            reverse("sensor-reading-list"),
+            record,
+            content_type=SENSOR_READING_MEDIA_TYPE,
+            HTTP_ACCEPT=SENSOR_READING_MEDIA_TYPE,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["Content-Type"], SENSOR_READING_MEDIA_TYPE)
+        [(id, system, created_at, ph, _, tds)] = SENSOR_READING_RECORD.iter_unpack(
+            response.content
+        )
+        reading = SensorReading.objects.get(pk=id)
+        self.assertEqual((system, ph, tds), (self.systems[1].id, 710, 40050))
+        self.assertEqual(EPOCH + timedelta(microseconds=created_at), reading.created_at)
+
+        response = self.client.post(
+            reverse("sensor-reading-bulk"),
+            record * 3,
+            content_type=SENSOR_READING_MEDIA_TYPE,
+        )
+        self.assertEqual(response.json(), {"created": 3})
+
+        for data in [record * 2, record[:-1], b""]:
+            response = self.client.post(
+                reverse("sensor-reading-list"),
+                data,
+                content_type=SENSOR_READING_MEDIA_TYPE,
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        query_params = {"ordering": "-created_at", "page_size": 3}
+        response = self.client.get(
+            reverse("sensor-reading-list"),
+            {**query_params, "format": "bin"},
+        )
+        self.assertEqual(response["Content-Type"], SENSOR_READING_MEDIA_TYPE)
+        self.assertEqual(response["X-Total-Count"], "8")
+        self.assertIn('rel="next"', response["Link"])
+        results = self.client.get(reverse("sensor-reading-list"), query_params)
+        results = results.json()["results"]
+        records = list(SENSOR_READING_RECORD.iter_unpack(response.content))
+        self.assertListEqual(
+            [(id, system, ph) for id, system, _, ph, _, _ in records],
+            [(reading["id"], reading["hydroponic_system"], 710) for reading in results],
+        )
+        created_at = EPOCH + timedelta(microseconds=records[0][2])
+        self.assertEqual(
+            created_at.isoformat().replace("+00:00", "Z"), results[0]["created_at"]
+        )
+
+        response = self.client.get(
+            reverse("sensor-reading-export"), {"ph__lte": 5, "format": "bin"}
+        )
+        content = b"".join(response.streaming_content)
+        records = list(SENSOR_READING_RECORD.iter_unpack(content))
+        self.assertListEqual(
+            [record[0] for record in records],
+            [self.readings[0].id],
+        )
+        self.assertEqual(records[0][2], 1717506000 * 10**6)
+
+        response = self.client.get(
+            reverse("sensor-reading-list"), {"ph": "invalid", "format": "bin"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ph", response.json())
+
+    def test_sensor_reading_partitions(self):
+        def get_partition_counts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT tableoid::regclass::text, COUNT(*) "
+                    "FROM core_sensorreading GROUP BY 1"
+                )
+                return dict(cursor.fetchall())
+
+        self.assertDictEqual(get_partition_counts(), {"core_sensorreading_default": 5})
+
+        call_command(
+            "create_sensor_reading_partitions",
+            since="2024-06-01T00:00:00Z",
+            stdout=io.StringIO(),
+        )
+        self.assertDictEqual(
+            get_partition_counts(), {"core_sensorreading_p20240601": 5}
+        )
+
+        partitions = get_partitions("core_sensorreading")
+        self.assertEqual(partitions[0].name, "core_sensorreading_p20240601")
+        self.assertEqual(partitions[0].end.isoformat(), "2024-07-01T00:00:00+00:00")
+        self.assertGreater(partitions[-1].start, timezone.now())
+
+        response = self.request(
+            "get",
+            "sensor-reading-list",
+            query_params={"created_at__gte": "2024-06-04T13:02:00Z"},
+            user=self.users[1],
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_sensor_reading_legacy_partition(self):
+        # The readings stored before the table was partitioned are attached as
+        # a partition without a lower bound.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE partitioned (created_at timestamptz NOT NULL) "
+                "PARTITION BY RANGE (created_at)"
+            )
+            cursor.execute(
+                "CREATE TABLE partitioned_legacy PARTITION OF partitioned "
+                "FOR VALUES FROM (MINVALUE) TO ('2024-07-01T00:00:00Z')"
+            )
+            cursor.execute(
+                "CREATE TABLE partitioned_default PARTITION OF partitioned DEFAULT"
+            )
+
+        start = parse_datetime("2024-05-01T00:00:00Z")
+        end = parse_datetime("2024-08-01T00:00:00Z")
+        created = create_partitions("partitioned", start, end, "month")
+        self.assertListEqual(
+            [partition.name for partition in created],
+            ["partitioned_p20240701", "partitioned_p20240801"],
+        )
+        partitions = get_partitions("partitioned")
+        self.assertEqual(partitions[0].name, "partitioned_legacy")
+        self.assertIsNone(partitions[0].start)
+        self.assertEqual(partitions[0].end, parse_datetime("2024-07-01T00:00:00Z"))
+
+    def test_sensor_reading_retention(self):
+        def get_reading_counts():
+            return [
+                HydroponicSystem.objects.get(pk=system.pk).reading_count
+                for system in self.systems
+            ]
+
+        recent = SensorReadingFactory(hydroponic_system=self.systems[0])
+        RetentionPolicy.objects.create(
+            owner=self.users[0], raw_retention_days=30, hourly_rollup_retention_days=30
+        )
+        RetentionPolicy.objects.create(hydroponic_system=self.systems[2])
+
+        output = io.StringIO()
+        versions = [get_owner_version(user.pk) for user in self.users]
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "enforce_sensor_reading_retention", batch_size=1, stdout=output
+            )
+        self.assertNotEqual(get_owner_version(self.users[0].pk), versions[0])
+        self.assertEqual(get_owner_version(self.users[1].pk), versions[1])
+        self.assertIn("Deleted 3 sensor readings.", output.getvalue())
+        self.assertListEqual(get_reading_counts(), [1, 0, 2])
+        self.assertIn("Deleted 2 hourly sensor reading rollups.", output.getvalue())
+        self.assertCountEqual(
+            SensorReading.objects.values_list("id", flat=True),
+            [recent.id, self.readings[3].id, self.readings[4].id],
+        )
+        self.assertEqual(
+            HourlySensorReadingRollup.objects.filter(
+                hydroponic_system__in=self.systems[:2]
+            ).count(),
+            1,
+        )
+
+        call_command(
+            "create_sensor_reading_partitions",
+            since="2024-06-01T00:00:00Z",
+            stdout=io.StringIO(),
+        )
+        RetentionPolicy.objects.filter(hydroponic_system=self.systems[2]).delete()
+        # Moved readings have pending foreign key checks until the end of the
+        # test transaction, which would prevent dropping their partition.
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        output = io.StringIO()
+        with (
+            self.settings(SENSOR_READING_RAW_RETENTION_DAYS=60),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            call_command("enforce_sensor_reading_retention", stdout=output)
+        self.assertNotEqual(get_owner_version(self.users[1].pk), versions[1])
+        self.assertIn(
+            "Dropped partition core_sensorreading_p20240601.", output.getvalue()
+        )
+        self.assertIn("Deleted 0 sensor readings.", output.getvalue())
+        self.assertListEqual(get_reading_counts(), [1, 0, 0])
+        self.assertListEqual(
+            list(SensorReading.objects.values_list("id", flat=True)), [recent.id]
+        )
+
+    def test_sensor_reading_rollup_rebuild_after_retention(self):
+        def get_rollups(model):
+            return list(
+                model.objects.order_by("hydroponic_system", "period_start").values_list(
+                    "hydroponic_system", "period_start", "count", "ph_sum"
+                )
+            )
+
+        SensorReadingFactory(hydroponic_system=self.systems[0])
+        RetentionPolicy.objects.create(owner=self.users[0], raw_retention_days=30)
+        hourly = get_rollups(HourlySensorReadingRollup)
+        daily = get_rollups(DailySensorReadingRollup)
+
+        call_command("enforce_sensor_reading_retention", stdout=io.StringIO())
+        self.assertEqual(SensorReading.objects.filter(owner=self.users[0]).count(), 1)
+
+        # The rollups of the expired readings are kept and the other ones are
+        # rebuilt.
+        HourlySensorReadingRollup.objects.filter(
+            hydroponic_system=self.systems[2]
+        ).delete()
+        call_command("rebuild_sensor_reading_rollups", stdout=io.StringIO())
+        self.assertListEqual(get_rollups(HourlySensorReadingRollup), hourly)
+        self.assertListEqual(get_rollups(DailySensorReadingRollup), daily)
+
+
+class TestAlerts(APITestCase):
+    def setUp(self):
+        self.users = UserFactory.create_batch(2)
+        self.systems = [
+            HydroponicSystemFactory(owner=self.users[0]),
+            HydroponicSystemFactory(owner=self.users[1]),
+        ]
+        self.rule = AlertRule.objects.create(
+            hydroponic_system=self.systems[0],
+            metric="ph",
+            min_value=Decimal("5.50"),
+            max_value=Decimal("6.50"),
+            window=3,
+            max_deviation=Decimal("3.00"),
+        )
+
+    def ingest(self, system, values, start=None):
+        start = start or timezone.now()
+        readings = [
+            SensorReading(
+                ph=value,
+                water_temp=20,
+                tds=800,
+                hydroponic_system=system,
+                created_at=start + timedelta(minutes=i),
+            )
+            for i, value in enumerate(values)
+        ]
+        SensorReading.objects.ingest(readings)
+
+    def get_alert_kinds(self):
+        return list(
+            Alert.objects.order_by("created_at", "kind").values_list("kind", flat=True)
+        )
+
+    def test_alert_rules(self):
+        def request_and_check_status(
+            method, view_name, view_kwargs=None, data=None, user=None, status_code=None
+        ):
+            response = self.request(
+                method, view_name, view_kwargs=view_kwargs, data=data, user=user
+            )
+            self.assertEqual(response.status_code, status_code)
+            return response
+
+        data = {"hydroponic_system": self.systems[0].id, "metric": "tds"}
+        request_and_check_status(
+            "post",
+            "alert-rule-list",
+            data=data,
+            status_code=status.HTTP_401_UNAUTHORIZED,
+        )
+        request_and_check_status(
+            "post",
+            "alert-rule-list",
+            data=data,
+            user=self.users[0],
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+        data.update(min_value="900.00", max_value="600.00")
+        request_and_check_status(
+            "post",
+            "alert-rule-list",
+            data=data,
+            user=self.users[0],
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+        data.update(min_value="600.00", max_value="900.00")
+        request_and_check_status(
+            "post",
+            "alert-rule-list",
+            data=data,
+            user=self.users[1],
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+        response = request_and_check_status(
+            "post",
+            "alert-rule-list",
+            data=data,
+            user=self.users[0],
+            status_code=status.HTTP_201_CREATED,
+        )
+        rule_id = response.json()["id"]
+
+        response = request_and_check_status(
+            "get", "alert-rule-list", user=self.users[1], status_code=status.HTTP_200_OK
+        )
+        self.assertEqual(response.json()["count"], 0)
+        request_and_check_status(
+            "get",
+            "alert-rule-detail",
+            view_kwargs={"pk": rule_id},
+            user=self.users[1],
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+
+        self.ingest(self.systems[0], [6, 6])
+        response = request_and_check_status(
+            "get",
+            "alert-rule-detail",
+            view_kwargs={"pk": self.rule.id},
+            user=self.users[0],
+            status_code=status.HTTP_200_OK,
+        )
+        self.assertEqual(response.json()["count"], 2)
+        self.assertEqual(response.json()["mean"], 6.0)
+        self.assertEqual(response.json()["stddev"], 0.0)
+
+        # Changing the metric or the window resets the rolling statistics.
+        response = request_and_check_status(
+            "patch",
+            "alert-rule-detail",
+            view_kwargs={"pk": self.rule.id},
+            data={"window": 5},
+            user=self.users[0],
+            status_code=status.HTTP_200_OK,
+        )
+        self.assertEqual(response.json()["count"], 0)
+        self.assertIsNone(response.json()["mean"])
+        response = request_and_check_status(
+            "patch",
+            "alert-rule-detail",
+            view_kwargs={"pk": self.rule.id},
+            data={"min_value": "7.00"},
+            user=self.users[0],
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_alert_evaluation(self):
+        start = timezone.now()
+        self.ingest(self.systems[0], [6, 6, "6.1"], start)
+        self.assertListEqual(self.get_alert_kinds(), [])
+
+        # The value leaves the range, deviates from the rolling mean and drags
+        # the mean out of the range.
+        self.ingest(self.systems[0], [7], start + timedelta(minutes=3))
+        self.assertListEqual(
+            self.get_alert_kinds(), [Alert.DEVIATION, Alert.DRIFT, Alert.OUT_OF_RANGE]
+        )
+        alert = Alert.objects.get(kind=Alert.DRIFT)
+        self.assertEqual(alert.value, Decimal("7.00"))
+        self.assertAlmostEqual(alert.mean, 6.525)
+        self.assertEqual(alert.hydroponic_system_id, self.systems[0].id)
+
+        # Alerts are triggered again only after the value and the mean return to
+        # the range.
+        self.ingest(self.systems[0], ["7.1"], start + timedelta(minutes=4))
+        self.assertEqual(Alert.objects.count(), 3)
+        self.ingest(self.systems[0], [6, 6, 7], start + timedelta(minutes=5))
+        self.assertEqual(Alert.objects.filter(kind=Alert.OUT_OF_RANGE).count(), 2)
+
+        # The state is stored with the rule.
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.count, 8)
+        self.assertTrue(self.rule.value_out_of_range)
+
+        # Readings of other systems do not affect the rule.
+        self.ingest(self.systems[1], [1, 1, 1, 1])
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.count, 8)
+
+        response = self.request(
+            "get", "alert-list", query_params={"kind": "drift"}, user=self.users[0]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertListEqual(
+            [alert["kind"] for alert in results], [Alert.DRIFT, Alert.DRIFT]
+        )
+        self.assertGreater(results[0]["created_at"], results[1]["created_at"])
+        response = self.request("get", "alert-list", user=self.users[1])
+        self.assertListEqual(response.json()["results"], [])
+
+        data = {"ph": "1.00", "water_temp": "20.00", "tds": "800.00"}
+        data["hydroponic_system"] = self.systems[0].id
+        response = self.request(
+            "post", "sensor-reading-list", data=data, user=self.users[0]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.count, 9)
+
+
+@override_settings(SENSOR_READING_LIVE_ENABLED=True)
+class TestLiveSensorReadings(TransactionTestCase):
+    # Notifications are only delivered when the transaction is committed.
+    def setUp(self):
+        self.users = UserFactory.create_batch(2)
+        self.systems = [
+            HydroponicSystemFactory(owner=self.users[0]),
+            HydroponicSystemFactory(owner=self.users[0]),
+            HydroponicSystemFactory(owner=self.users[1]),
+        ]
+        self.token = Token.objects.create(user=self.users[0])
+        self.url = reverse("sensor-reading-live")
+
+    def create_readings(self, systems, ph="6.1"):
+        readings = [
+            SensorReading(ph=ph, water_temp=20, tds=800, hydroponic_system=system)
+            for system in systems
+        ]
+        return SensorReading.objects.ingest(readings)
+
+    def test_encode_notifications(self):
+        readings = self.create_readings([self.systems[0]] * 200)
+        payloads = encode_notifications(readings)
+        self.assertGreater(len(payloads), 1)
+
+        items = [item for payload in payloads for item in json.loads(payload)]
+        self.assertTrue(all(len(payload) < PAYLOAD_MAX_SIZE for payload in payloads))
+        self.assertEqual(len(items), 200)
+        self.assertListEqual(
+            items[0],
+            [self.users[0].id, SensorReadingSerializer(readings[0]).data],
+        )
+        self.assertEqual(items[0][1]["water_temp"], "20.00")
+
+    async def read_event(self, stream):
+        while True:
+            chunk = await asyncio.wait_for(anext(stream), 5)
+            if not chunk.startswith(b":"):
+                return chunk
+
+    async def test_sensor_reading_live(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        headers = {"Authorization": f"Token {self.token.key}"}
+        with self.settings(SENSOR_READING_LIVE_ENABLED=False):
+            response = await self.async_client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(
+            self.url, {"hydroponic_system": self.systems[2].id}, headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(
+            self.url, {"hydroponic_system": "invalid"}, headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await self.async_client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        system_response = await self.async_client.get(
+            self.url, {"hydroponic_system": self.systems[1].id}, headers=headers
+        )
+        system_stream = aiter(system_response.streaming_content)
+        # Both streams are subscribed once they have sent the first comment.
+        self.assertEqual(await anext(stream), b": connected\n\n")
+        self.assertEqual(await anext(system_stream), b": connected\n\n")
+
+        readings = await sync_to_async(self.create_readings)(
+            [self.systems[2], self.systems[0], self.systems[1]]
+        )
+
+        for reading in readings[1:]:
+            event = (await self.read_event(stream)).decode()
+            lines = event.strip().split("\n")
+            self.assertEqual(lines[0], f"id: {reading.id}")
+            self.assertEqual(lines[1], "event: sensor_reading")
+            self.assertDictEqual(
+                json.loads(lines[2].removeprefix("data: ")),
+                SensorReadingSerializer(reading).data,
+            )
+
+        event = (await self.read_event(system_stream)).decode()
+        self.assertTrue(event.startswith(f"id: {readings[2].id}\n"))
+
+        await stream.aclose()
+        await system_stream.aclose()
+
+    @override_settings(SENSOR_READING_LIVE_KEEPALIVE=0.05)
+    async def test_sensor_reading_live_keepalive(self):
+        # The hub never starts listening, so the stream stops waiting for it
+        # and then only sends keepalive comments until a reading arrives.
+        hub = SensorReadingHub()
+        subscription = Subscription(self.users[0].id)
+        stream = stream_sensor_readings(hub, subscription)
+        self.assertEqual(await anext(stream), ": connected\n\n")
+        self.assertEqual(await anext(stream), ": keepalive\n\n")
+        self.assertEqual(await anext(stream), ": keepalive\n\n")
+
+        subscription.put({"id": 1, "hydroponic_system": self.systems[0].id})
+        self.assertTrue((await anext(stream)).startswith("id: 1\n"))
+        await stream.aclose()
+        self.assertTrue(subscription.closed)
+
+
+class TestDatabasePool(APITestCase):
+    def test_database_pool_stats(self):
+        user = UserFactory()
+        response = self.request("get", "database-pool-stats")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.request("get", "database-pool-stats", user=user)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.request("get", "database-pool-stats", user=user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.json()["default"]
+        pool_options = connection.settings_dict["OPTIONS"]["pool"]
+        self.assertEqual(stats["pool_min"], pool_options["min_size"])
+        self.assertEqual(stats["pool_max"], pool_options["max_size"])
+        self.assertGreaterEqual(stats["connections_num"], 1)
+
+
+class TestDatabasePoolConnections(TransactionTestCase):
+    def test_database_pool_connections(self):
+        def get_backend_pid():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                return cursor.fetchone()[0]
+
+        # Closed connections are returned to the pool and taken out again.
+        pids = set()
+        for i in range(connection.pool.max_size * 2):
+            pids.add(get_backend_pid())
+            connection.close()
+            self.assertIsNone(connection.connection)
+        self.assertLessEqual(len(pids), connection.pool.max_size)
+        pid = get_backend_pid()
+        self.assertIn(pid, pids)
+
+        connection.close()
+        connection.close_pool()
+        self.assertIsNone(connection.get_pool_stats())
+        self.assertNotIn(get_backend_pid(), pids)
+        self.assertIsNotNone(connection.get_pool_stats())
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class TestReplicaRouter(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def test_replica_router(self):
+        self.assertEqual(get_replica(self.user.pk), "replica")
+        with reads_from("replica"):
+            self.assertEqual(SensorReading.objects.all().db, "replica")
+            self.assertEqual(router.db_for_write(SensorReading), "default")
+        self.assertEqual(SensorReading.objects.all().db, "default")
+
+        pin_owners_to_primary([self.user.pk])
+        self.assertIsNone(get_replica(self.user.pk))
+        self.assertEqual(get_replica(UserFactory().pk), "replica")
+
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            HydroponicSystemFactory(owner=self.user)
+            self.assertEqual(get_replica(self.user.pk), "replica")
+        self.assertIsNone(get_replica(self.user.pk))
+
+        with override_settings(DATABASE_REPLICA_PIN_SECONDS=0):
+            cache.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                HydroponicSystemFactory(owner=self.user)
+            self.assertEqual(get_replica(self.user.pk), "replica")
+
+
+@skipUnless("replica" in settings.DATABASES, "No replica database is configured.")
+@override_settings(DATABASE_REPLICAS=["replica"])
+class TestReplicaReads(APITestCase):
+    # The replica database stays empty, like a replica lagging behind.
+    databases = "__all__"
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.system = HydroponicSystemFactory(owner=self.user)
+        SensorReadingFactory(hydroponic_system=self.system)
+        # Forgets the pins of the writes above.
+        cache.clear()
+
+    def test_replica_reads(self):
+        def get_counts():
+            systems = self.request("get", "hydroponic-system-list", user=self.user)
+            readings = self.request("get", "sensor-reading-list", user=self.user)
+            return systems.json()["count"], readings.json()["count"]
+
+        self.assertEqual(get_counts(), (0, 0))
+        response = self.request(
+            "get",
+            "hydroponic-system-detail",
+            view_kwargs={"pk": self.system.pk},
+            user=self.user,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Writes go to the primary and pin the user to it.
+        data = {"name": "Tomatoes", "plant_count": 4}
+        response = self.request(
+            "post", "hydroponic-system-list", data=data, user=self.user
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(get_counts(), (2, 1))
+
+        cache.clear()
+        self.assertEqual(get_counts(), (0, 0))
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.get(reverse("sensor-reading-async-list"))
+        self.assertEqual(response.json()["results"], [])
+
+
+class TestQueryBudget(APITestCase):
+    @override_settings(
+        QUERY_BUDGET_ENABLED=True,
+        QUERY_BUDGET_HEADERS=True,
+        QUERY_BUDGETS={"HydroponicSystemViewSet.list": 1},
+    )
+    def test_query_budget_middleware(self):
+        cache.clear()
+        user = UserFactory()
+        HydroponicSystemFactory(owner=user)
+        self.client = self.client_class()
+        self.client.force_authenticate(user=user)
+
+        with self.assertLogs("core.middleware", "WARNING") as logs:
+            response = self.client.get(reverse("hydroponic-system-list"))
+        self.assertEqual(response["X-Query-Count"], "2")
+        self.assertTrue(response["X-Query-Duration"].endswith("ms"))
+        self.assertIn("HydroponicSystemViewSet.list", logs.output[0])
+
+        cache.clear()
+        with self.assertRaises(AssertionError), self.assertLogs("core.middleware"):
+            self.request("get", "hydroponic-system-list", user=user)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_HEADERS=True)
+    async def test_query_budget_middleware_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(get_response)))
+
+        user = await sync_to_async(UserFactory)()
+        token = await Token.objects.acreate(user=user)
+        url = reverse("sensor-reading-async-list")
+        headers = {"Authorization": f"Token {token.key}"}
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The token is looked up only by the first request.
+        self.assertEqual(response["X-Query-Count"], "2")
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response["X-Query-Count"], "1")
+
+
+# Requests with cold authentication caches are over the query budgets.
+@override_settings(QUERY_BUDGET_ENABLED=False)
+class TestAuthentication(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.user.set_password("password")
+        self.user.save()
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse("hydroponic-system-list")
+
+    def test_token_authentication(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(reverse("rest_logout"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_CACHE_ALIAS="default", AUTH_CACHE_LOCAL_TIMEOUT=0.2)
+    def test_token_revocation_in_other_process(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Another process deletes the token and its shared cache entry, but
+        # not the local cache entry of this process.
+        Token.objects.filter(pk=self.token.pk)._raw_delete("default")
+        cache.delete(get_token_auth_key(self.token.key))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        time.sleep(0.25)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_session_authentication(self):
+        self.client.login(username=self.user.username, password="password")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Only the session is read from the database, the user is cached.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # A session deleted by another process is rejected right away.
+        session_key = self.client.session.session_key
+        Session.objects.filter(pk=session_key)._raw_delete("default")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.login(username=self.user.username, password="password")
+        self.user.set_password("changed")
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestSeeding(APITestCase):
+    def test_seed_sensor_readings(self):
+        stdout = io.StringIO()
+        call_command(
+            "seed_sensor_readings",
+            "--users=2",
+            "--systems-per-user=3",
+            "--readings-per-system=500",
+            "--interval=600",
+            "--end=2024-06-04T12:00:00Z",
+            "--batch-size=700",
+            "--seed=7",
+            stdout=stdout,
+        )
+        self.assertIn(
+            "2 users, 6 hydroponic systems and 3000 sensor", stdout.getvalue()
+        )
+
+        readings = SensorReading.objects.filter(owner__username__startswith="seed7_")
+        self.assertEqual(readings.count(), 3000)
+        first = readings.order_by("created_at", "id").first()
+        last = readings.order_by("created_at", "id").last()
+        self.assertEqual(last.created_at.isoformat(), "2024-06-04T12:00:00+00:00")
+        self.assertEqual(
+            last.created_at - first.created_at, timedelta(minutes=10 * 499)
+        )
+        for reading in readings[:100]:
+            self.assertEqual(reading.owner_id, reading.hydroponic_system.owner_id)
+            self.assertTrue(0 <= reading.ph <= 14)
+
+        rollups = DailySensorReadingRollup.objects.filter(
+            hydroponic_system__owner__username__startswith="seed7_"
+        )
+        self.assertEqual(sum(rollup.count for rollup in rollups), 3000)
+
+        system = readings.first().hydroponic_system
+        self.assertEqual(system.reading_count, 500)
+        self.assertEqual(system.last_reading_at, last.created_at)
+        values = list(
+            system.sensor_readings.order_by("created_at").values_list(
+                "ph", "water_temp", "tds"
+            )
+        )
+        rows = generate_readings(
+            system.id, system.owner_id, first.created_at, timedelta(minutes=10), 500, 7
+        )
+        self.assertListEqual(
+            [tuple(map(Decimal, row.split("\t")[:3])) for row in rows], values
+        )
+
+
+class TestBenchmarks(TransactionTestCase):
+    def test_benchmark_api_keepdb(self):
+        # The test environment is already set up by the test runner. The second
+        # run seeds the database kept by the first one and the last run drops it.
+        command = "core.management.commands.benchmark_api"
+        with (
+            mock.patch(f"{command}.setup_test_environment"),
+            mock.patch(f"{command}.teardown_test_environment"),
+        ):
+            for keepdb in (True, True, False):
+                stdout = io.StringIO()
+                call_command(
+                    "benchmark_api",
+                    "--users=2",
+                    "--systems-per-user=2",
+                    "--readings-per-system=10",
+                    "--requests=2",
+                    "--warmup=1",
+                    "--case=SensorReadingViewSet.create",
+                    keepdb=keepdb,
+                    verbosity=0,
+                    stdout=stdout,
+                )
+                results = json.loads(stdout.getvalue())["results"]
+                self.assertEqual(results["SensorReadingViewSet.create"]["requests"], 2)
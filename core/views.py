@@ -1,22 +1,163 @@
-from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from rest_framework.mixins import CreateModelMixin, ListModelMixin
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, GenericViewSet, ReadOnlyModelViewSet
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import Throttled, ValidationError
 from rest_framework.filters import OrderingFilter
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from core.models import HydroponicSystem, SensorReading
-from core.serializers import HydroponicSystemSerializer, SensorReadingSerializer
-from core.paginations import HydroponicSystemPagination, SensorReadingPagination
-from core.permissions import IsHydroponicSystemOwner
-from core.filters import HydroponicSystemFilter, SensorReadingFilter
+from django.db import connections
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from datetime import timedelta
+from core.models import (
+    Alert,
+    AlertRule,
+    DailySensorReadingRollup,
+    HourlySensorReadingRollup,
+    HydroponicSystem,
+    SensorReading,
+)
+from core.serializers import (
+    HydroponicSystemDashboardSerializer,
+    AlertRuleSerializer,
+    AlertSerializer,
+    HydroponicSystemSerializer,
+    SensorReadingSerializer,
+    SensorReadingAggregateQuerySerializer,
+    SensorReadingAggregateSerializer,
+    SensorReadingStatsQuerySerializer,
+    SensorReadingStatsSerializer,
+    ValuesSerializer,
+)
+from core.paginations import (
+    AlertPagination,
+    AlertRulePagination,
+    HydroponicSystemPagination,
+    SensorReadingPagination,
+)
+from core.permissions import IsHydroponicSystemOwner, check_hydroponic_system_owner
+from core.filters import (
+    AlertFilter,
+    AlertRuleFilter,
+    HydroponicSystemFilter,
+    SensorReadingFilter,
+)
+from core.functions import date_bin
+from core.buffer import get_buffer
+from core.db.routers import get_replica, read_database, reads_from
+from core.cache import get_cache, get_owner_version, get_response_cache_key
+from core.parsers import SensorReadingBinaryParser
+from core.renderers import CSVRenderer, NDJSONRenderer, SensorReadingBinaryRenderer
 
 
-class HydroponicSystemViewSet(ModelViewSet):
+class ReplicaReadMixin:
+    # Reads of safe requests from a replica, unless the user is pinned to the
+    # primary after a recent write. Querysets are bound to the replica, so that
+    # streamed responses read from it after the request is handled.
+    def dispatch(self, request, *args, **kwargs):
+        with reads_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            read_database.set(get_replica(request.user.pk))
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        alias = read_database.get()
+        return qs if alias is None else qs.using(alias)
+
+
+class ValuesListModelMixin:
+    # Lists objects by serializing `values()` rows instead of model instances.
+    # The output is the same as the one of `ListModelMixin`, which is used when
+    # `can_list_values` returns False. Renderers with `render_values` get the
+    # rows as they are.
+    def list(self, request, *args, **kwargs):
+        if not self.can_list_values():
+            return super().list(request, *args, **kwargs)
+
+        values_serializer = ValuesSerializer.for_serializer(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(*values_serializer.sources)
+
+        to_representation = values_serializer.to_representation
+        if getattr(request.accepted_renderer, "render_values", False):
+            to_representation = list
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(to_representation(page))
+
+        return Response(to_representation(queryset))
+
+    def can_list_values(self):
+        return True
+
+
+class OwnerCachedResponseMixin:
+    # Caches the data of successful responses of `cached_actions` per owner.
+    # Every write bumps the owner's version, which is a part of the cache key, so
+    # stale responses are never looked up again. The key doubles as the `ETag`,
+    # which lets unchanged responses be confirmed without querying the database.
+    cached_actions = ["list", "retrieve", "stats"]
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.cached_actions:
+            return handler(request, *args, **kwargs)
+
+        owner_id = request.user.pk
+        version = get_owner_version(owner_id)
+        key = get_response_cache_key(request, owner_id, version, self.action)
+        etag = quote_etag(key.rsplit(":", 1)[-1])
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache = get_cache()
+            data = cache.get(key)
+
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept", "Authorization", "Cookie"])
+        return response
+
+
+class HydroponicSystemViewSet(
+    ReplicaReadMixin, OwnerCachedResponseMixin, ValuesListModelMixin, ModelViewSet
+):
     serializer_class = HydroponicSystemSerializer
     pagination_class = HydroponicSystemPagination
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = HydroponicSystemFilter
-    ordering_fields = ["name", "plant_count", "created_at"]
+    ordering_fields = [
+        "name",
+        "plant_count",
+        "created_at",
+        "reading_count",
+        "last_reading_at",
+    ]
     ordering = ["created_at"]
 
     def get_queryset(self):
@@ -25,22 +166,82 @@ class HydroponicSystemViewSet(ModelViewSet):
 
         if self.action == "retrieve":
             qs = qs.prefetch_recent_sensor_readings()
+        elif self.is_dashboard():
+            qs = qs.annotate_sensor_reading_summary()
+        elif self.action == "stats":
+            qs = qs.only("id", "owner_id")
 
         return qs
 
+    def filter_queryset(self, queryset):
+        # Systems with equal ordering values, like the ones without readings
+        # ordered by `last_reading_at`, are ordered by id to keep pages stable.
+        queryset = super().filter_queryset(queryset)
+        ordering = queryset.query.order_by
+        if ordering and not any(
+            str(field).lstrip("-") in ("id", "pk") for field in ordering
+        ):
+            queryset = queryset.order_by(*ordering, "id")
+        return queryset
+
     def get_permissions(self):
         permission_classes = [IsAuthenticated]
 
-        if self.action in ["retrieve", "update", "partial_update", "destroy"]:
+        if self.action in ["retrieve", "update", "partial_update", "destroy", "stats"]:
             permission_classes.append(IsHydroponicSystemOwner)
 
         return [permission_class() for permission_class in permission_classes]
 
+    def get_serializer_class(self):
+        if self.is_dashboard():
+            return HydroponicSystemDashboardSerializer
+        return super().get_serializer_class()
+
+    def is_dashboard(self):
+        return (
+            self.action == "list"
+            and self.request.query_params.get("mode") == "dashboard"
+        )
+
+    def can_list_values(self):
+        return not self.is_dashboard()
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    @action(detail=True, filter_backends=[])
+    def stats(self, request, pk=None):
+        return self.get_cached_response(self.get_stats_response, request, pk=pk)
+
+    def get_stats_response(self, request, pk=None):
+        system = self.get_object()
+        query_serializer = SensorReadingStatsQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        params = query_serializer.validated_data
+        target_ranges = params.pop("target_ranges")
+
+        stats = system.sensor_readings.filter(**params).stats(target_ranges)
+
+        data = {"hydroponic_system": system.pk, "count": stats["count"]}
+        for metric in SensorReading.METRICS:
+            target_min, target_max = target_ranges[metric]
+            data[metric] = {
+                "mean": stats[f"{metric}_mean"],
+                "stddev": stats[f"{metric}_stddev"],
+                "p5": stats[f"{metric}_p5"],
+                "p50": stats[f"{metric}_p50"],
+                "p95": stats[f"{metric}_p95"],
+                "target_min": target_min,
+                "target_max": target_max,
+                "time_in_range": stats[f"{metric}_time_in_range"],
+            }
 
-class SensorReadingViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
+        return Response(SensorReadingStatsSerializer(data).data)
+
+
+class SensorReadingViewSet(
+    ReplicaReadMixin, ValuesListModelMixin, CreateModelMixin, GenericViewSet
+):
     serializer_class = SensorReadingSerializer
     pagination_class = SensorReadingPagination
     permission_classes = [IsAuthenticated]
@@ -48,15 +249,242 @@ class SensorReadingViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
     filterset_class = SensorReadingFilter
     ordering_fields = ["ph", "water_temp", "tds", "created_at"]
     ordering = ["created_at"]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, SensorReadingBinaryParser]
+    binary_actions = ["list", "create", "bulk"]
+    bulk_max_length = 10000
+    export_chunk_size = 2000
+    aggregate_max_rows = 5000
+    aggregate_rollup_params = {
+        "bucket",
+        "hydroponic_system",
+        "created_at__gte",
+        "created_at__lte",
+        "ordering",
+        "format",
+    }
 
     def get_queryset(self):
         user = self.request.user
-        return SensorReading.objects.filter(hydroponic_system__owner=user)
+        return SensorReading.objects.filter(owner=user)
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if self.action in self.binary_actions:
+            renderers.append(SensorReadingBinaryRenderer())
+        return renderers
+
+    def create(self, request, *args, **kwargs):
+        if not settings.SENSOR_READING_BUFFER_ENABLED:
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        check_hydroponic_system_owner(
+            request, [serializer.validated_data["hydroponic_system"]]
+        )
+
+        buffer = get_buffer()
+        reading = SensorReading(**serializer.validated_data)
+        if not buffer.add(reading):
+            raise Throttled(
+                wait=buffer.flush_interval,
+                detail="Too many sensor readings are waiting to be saved.",
+            )
+
+        # The reading keeps its `created_at`, but has no `id` until it is saved.
+        serializer = self.get_serializer(reading)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
     def perform_create(self, serializer):
-        owner = serializer.validated_data["hydroponic_system"].owner
+        check_hydroponic_system_owner(
+            self.request, [serializer.validated_data["hydroponic_system"]]
+        )
+        serializer.save()
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=self.bulk_max_length,
+        )
+        serializer.is_valid(raise_exception=True)
+        check_hydroponic_system_owner(
+            request, [attrs["hydroponic_system"] for attrs in serializer.validated_data]
+        )
+        readings = serializer.save()
+        return Response({"created": len(readings)}, status=status.HTTP_201_CREATED)
 
-        if self.request.user != owner:
-            raise PermissionDenied("You are not the owner of the hydroponic system.")
+    @action(detail=False)
+    def aggregate(self, request):
+        query_serializer = SensorReadingAggregateQuerySerializer(
+            data=request.query_params
+        )
+        query_serializer.is_valid(raise_exception=True)
+        bucket = query_serializer.validated_data["bucket"]
+        start = query_serializer.validated_data.get("created_at__gte")
+        end = query_serializer.validated_data.get("created_at__lte")
 
+        qs = self.filter_queryset(self.get_queryset())
+        querysets = [qs]
+
+        rollup_model = self.get_aggregate_rollup_model(bucket)
+        if rollup_model is not None:
+            querysets = self.split_aggregate_queryset(qs, rollup_model, start, end)
+
+        rows = {}
+        for queryset in querysets:
+            results = list(
+                queryset.aggregate_buckets(bucket)[: self.aggregate_max_rows + 1]
+            )
+            for row in results:
+                self.merge_aggregate_row(rows, row)
+
+            if len(rows) > self.aggregate_max_rows:
+                raise ValidationError(
+                    "Too many buckets. Use a wider bucket or a narrower time range."
+                )
+
+        for row in rows.values():
+            for metric in SensorReading.METRICS:
+                row[f"{metric}_avg"] = row[f"{metric}_sum"] / row["count"]
+
+        serializer = SensorReadingAggregateSerializer(
+            [rows[key] for key in sorted(rows)], many=True
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        renderer_classes=[CSVRenderer, NDJSONRenderer, SensorReadingBinaryRenderer],
+    )
+    def export(self, request):
+        fields = SensorReadingSerializer.Meta.fields
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .values_list(*fields)
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+
+        response = StreamingHttpResponse(
+            renderer.render_rows(fields, rows), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="sensor_readings.{renderer.format}"'
+        )
+        return response
+
+    def get_aggregate_rollup_model(self, bucket):
+        # Rollups can only be used when the readings are not filtered by values.
+        if not set(self.request.query_params) <= self.aggregate_rollup_params:
+            return None
+
+        for model in (DailySensorReadingRollup, HourlySensorReadingRollup):
+            if bucket % model.period == timedelta(0):
+                return model
+
+        return None
+
+    def split_aggregate_queryset(self, qs, rollup_model, start, end):
+        # Whole rollup periods are read from the rollups and only the partial
+        # periods at the edges of the time range from the readings.
+        period = rollup_model.period
+        rollups = rollup_model.objects.filter(
+            hydroponic_system__owner=self.request.user
+        )
+        edges = Q()
+
+        if self.request.query_params.get("hydroponic_system"):
+            rollups = rollups.filter(
+                hydroponic_system=self.request.query_params["hydroponic_system"]
+            )
+
+        if start is not None:
+            rollup_start = date_bin(period, start)
+            if rollup_start < start:
+                rollup_start += period
+            rollups = rollups.filter(period_start__gte=rollup_start)
+            edges |= Q(created_at__lt=rollup_start)
+
+        if end is not None:
+            rollup_end = date_bin(period, end)
+            rollups = rollups.filter(period_start__lt=rollup_end)
+            edges |= Q(created_at__gte=rollup_end)
+
+        if start is not None and end is not None and rollup_start >= rollup_end:
+            return [qs]
+        if not edges:
+            return [rollups]
+        return [rollups, qs.filter(edges)]
+
+    @staticmethod
+    def merge_aggregate_row(rows, row):
+        key = (row["hydroponic_system"], row["bucket"])
+        if key not in rows:
+            rows[key] = row
+            return
+
+        merged = rows[key]
+        merged["count"] += row["count"]
+        for metric in SensorReading.METRICS:
+            merged[f"{metric}_sum"] += row[f"{metric}_sum"]
+            merged[f"{metric}_min"] = min(merged[f"{metric}_min"], row[f"{metric}_min"])
+            merged[f"{metric}_max"] = max(merged[f"{metric}_max"], row[f"{metric}_max"])
+
+
+class AlertRuleViewSet(ModelViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AlertRuleSerializer
+    pagination_class = AlertRulePagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AlertRuleFilter
+
+    def get_queryset(self):
+        user = self.request.user
+        return AlertRule.objects.filter(hydroponic_system__owner=user).order_by("id")
+
+    def perform_create(self, serializer):
+        check_hydroponic_system_owner(
+            self.request, [serializer.validated_data["hydroponic_system"]]
+        )
+        serializer.save()
+
+    def perform_update(self, serializer):
+        if "hydroponic_system" in serializer.validated_data:
+            check_hydroponic_system_owner(
+                self.request, [serializer.validated_data["hydroponic_system"]]
+            )
         serializer.save()
+
+
+class AlertViewSet(ReadOnlyModelViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AlertSerializer
+    pagination_class = AlertPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AlertFilter
+
+    def get_queryset(self):
+        user = self.request.user
+        return Alert.objects.filter(hydroponic_system__owner=user)
+
+
+class DatabasePoolStatsView(APIView):
+    # The statistics of the connection pools of the process handling the
+    # request, for monitoring. Aliases without a pool are null.
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {
+                connection.alias: connection.get_pool_stats()
+                for connection in connections.all()
+                if hasattr(connection, "get_pool_stats")
+            }
+        )
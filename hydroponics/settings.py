@@ -54,6 +54,7 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -87,17 +88,59 @@ WSGI_APPLICATION = "hydroponics.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Every process keeps a pool of connections (see core/db/base.py), so requests
+# do not connect to the database. The pool opens POSTGRES_POOL_MIN_SIZE
+# connections and up to POSTGRES_POOL_MAX_SIZE under load. A request that finds
+# all of them in use waits up to POSTGRES_POOL_TIMEOUT seconds and then fails.
+# Connections are checked before they are handed out and replaced after being
+# idle for 10 minutes or open for an hour. Set POSTGRES_POOL to "false" to
+# connect once per request instead.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db",
         "NAME": os.getenv("POSTGRES_NAME"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pool": (
+                {
+                    "min_size": int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2)),
+                    "max_size": int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10)),
+                    "timeout": float(os.getenv("POSTGRES_POOL_TIMEOUT", 10)),
+                    "max_idle": 600,
+                    "max_lifetime": 3600,
+                }
+                if os.getenv("POSTGRES_POOL", "true") == "true"
+                else False
+            ),
+        },
     }
 }
 
+# Read replica. When POSTGRES_REPLICA_HOST is set, the GET requests of the
+# hydroponic system and sensor reading endpoints read from the replica (see
+# core/db/routers.py). After a user writes, their requests read from the primary
+# for DATABASE_REPLICA_PIN_SECONDS, which should be longer than the replication
+# lag, so that they never see stale data. The pins are stored in the response
+# cache, which has to be shared by the processes for them to apply everywhere.
+# For the tests, the replica can be a second database on the same server, e.g.
+# POSTGRES_REPLICA_NAME=replica, which stands in for a replica that lags behind.
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("POSTGRES_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+    }
+
+DATABASE_ROUTERS = ["core.db.routers.ReplicaRouter"]
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -121,19 +164,53 @@ AUTH_PASSWORD_VALIDATORS = [
 REST_FRAMEWORK = {
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "core.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
 }
 
+# Cache used for responses of the hydroponic system endpoints. It has to be
+# shared by all the processes serving the API, e.g. Redis or Memcached, because
+# it also stores the versions used to invalidate the responses. The local memory
+# cache below only works with a single process, `manage.py check --deploy`
+# warns about it.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Largest page size that clients can request with the `page_size` parameter.
+MAX_PAGE_SIZE = 1000
+
 
 AUTHENTICATION_BACKENDS = [
     # Needed to login by username in Django admin, regardless of `allauth`
-    "django.contrib.auth.backends.ModelBackend",
+    "core.backends.CachedModelBackend",
     # `allauth` specific authentication methods, such as login by email
-    "allauth.account.auth_backends.AuthenticationBackend",
+    "core.backends.CachedAuthenticationBackend",
 ]
 
+# Sessions are read from the database, so a logout takes effect in every process
+# right away. The cache and cached_db engines need SESSION_CACHE_ALIAS to name a
+# cache shared by all the processes, otherwise sessions deleted by one process
+# stay valid in the others; `manage.py check` refuses a local memory cache.
+SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+# Users authenticated by tokens and sessions are cached in every process, in an
+# LRU cache of at most AUTH_CACHE_MAX_SIZE entries that expire after
+# AUTH_CACHE_LOCAL_TIMEOUT seconds. They are also cached for AUTH_CACHE_TIMEOUT
+# seconds in the AUTH_CACHE_ALIAS cache unless it is None. Logouts, token
+# deletions and user changes clear the entries from the shared cache and the
+# cache of the current process, so other processes can accept revoked tokens
+# and sessions for up to AUTH_CACHE_LOCAL_TIMEOUT seconds.
+AUTH_CACHE_MAX_SIZE = 10000
+AUTH_CACHE_LOCAL_TIMEOUT = 5
+AUTH_CACHE_TIMEOUT = 60
+AUTH_CACHE_ALIAS = None
+
 ACCOUNT_EMAIL_VERIFICATION = "none"
 ACCOUNT_AUTHENTICATION_METHOD = "username_email"
 
@@ -161,3 +238,84 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.User"
+
+
+# Sensor readings
+
+# Length of the time ranges of the sensor reading table partitions, "day",
+# "week" or "month". Changing it only affects partitions created afterwards.
+SENSOR_READING_PARTITION_INTERVAL = "month"
+
+# Default numbers of days after which sensor readings and their hourly rollups
+# are deleted by the `enforce_sensor_reading_retention` command, unless a
+# retention policy of the hydroponic system or its owner says otherwise. None
+# means that they are never deleted. Daily rollups are kept forever.
+SENSOR_READING_RAW_RETENTION_DAYS = None
+SENSOR_READING_HOURLY_ROLLUP_RETENTION_DAYS = None
+
+# Default target ranges (inclusive) of the metrics, used for the time in range
+# returned by `GET /hydroponic_systems/{id}/stats`.
+SENSOR_READING_TARGET_RANGES = {
+    "ph": ("5.50", "6.50"),
+    "water_temp": ("18.00", "24.00"),
+    "tds": ("560.00", "1400.00"),
+}
+
+# Write-behind ingestion. When enabled, `POST /sensor_readings` only validates
+# the reading, adds it to an in-process buffer and responds with 202 Accepted.
+# The buffer is inserted in one transaction when FLUSH_SIZE readings are waiting
+# or FLUSH_INTERVAL seconds have passed, and when the process exits. Readings
+# accepted less than FLUSH_INTERVAL seconds before the process is killed (e.g.
+# with SIGKILL or a crash) are lost. When MAX_SIZE readings are waiting, requests
+# wait up to BLOCK_TIMEOUT seconds for a flush and then get 429 Too Many Requests.
+SENSOR_READING_BUFFER_ENABLED = False
+SENSOR_READING_BUFFER_MAX_SIZE = 10000
+SENSOR_READING_BUFFER_FLUSH_SIZE = 1000
+SENSOR_READING_BUFFER_FLUSH_INTERVAL = 1.0
+SENSOR_READING_BUFFER_BLOCK_TIMEOUT = 1.0
+
+# Live push of new readings. When SENSOR_READING_LIVE_ENABLED, every inserted
+# reading is announced with a Postgres NOTIFY on commit, and the processes of an
+# ASGI server push it to the clients subscribed with `GET /sensor_readings/live`.
+# A client with more than QUEUE_SIZE undelivered readings is disconnected. A
+# comment is sent after KEEPALIVE seconds without readings. It is disabled by
+# default, because a WSGI server cannot serve the stream and every insert would
+# still pay for the NOTIFY. Deployments served by an ASGI server enable it with
+# the SENSOR_READING_LIVE environment variable in all of their processes, since
+# readings created by a process without it are not pushed.
+SENSOR_READING_LIVE_ENABLED = os.getenv("SENSOR_READING_LIVE", "false") == "true"
+SENSOR_READING_LIVE_QUEUE_SIZE = 1000
+SENSOR_READING_LIVE_KEEPALIVE = 15
+
+# Query budgets. When QUERY_BUDGET_ENABLED, the queries made by every request
+# are counted and requests making more of them than the budget of their view are
+# logged. With QUERY_BUDGET_HEADERS the number and the total time of the queries
+# are sent in the X-Query-Count and X-Query-Duration headers. Budgets of viewset
+# actions are keyed like "SensorReadingViewSet.list", of other views by their URL
+# names. Authentication is cached, so the budgets do not include it. They are
+# also enforced by `APITestCase.request` in the tests.
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_HEADERS = DEBUG
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    "HydroponicSystemViewSet.list": 2,
+    "HydroponicSystemViewSet.retrieve": 2,
+    "HydroponicSystemViewSet.create": 1,
+    "HydroponicSystemViewSet.update": 2,
+    "HydroponicSystemViewSet.partial_update": 2,
+    "HydroponicSystemViewSet.destroy": 8,
+    "HydroponicSystemViewSet.stats": 2,
+    "SensorReadingViewSet.list": 3,
+    "SensorReadingViewSet.create": 11,
+    "SensorReadingViewSet.bulk": 11,
+    "SensorReadingViewSet.aggregate": 3,
+    "SensorReadingViewSet.export": 1,
+    "AlertRuleViewSet.list": 2,
+    "AlertRuleViewSet.retrieve": 1,
+    "AlertRuleViewSet.create": 2,
+    "AlertRuleViewSet.update": 3,
+    "AlertRuleViewSet.partial_update": 3,
+    "AlertRuleViewSet.destroy": 3,
+    "AlertViewSet.list": 1,
+    "AlertViewSet.retrieve": 1,
+}
@@ -1,18 +1,42 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from core.views import HydroponicSystemViewSet, SensorReadingViewSet
+from core.async_views import sensor_reading_list_create, sensor_reading_live
+from core.views import (
+    AlertRuleViewSet,
+    AlertViewSet,
+    DatabasePoolStatsView,
+    HydroponicSystemViewSet,
+    SensorReadingViewSet,
+)
 
 router = routers.DefaultRouter()
 router.register(
     r"hydroponic_systems", HydroponicSystemViewSet, basename="hydroponic-system"
 )
 router.register(r"sensor_readings", SensorReadingViewSet, basename="sensor-reading")
+router.register(r"alert_rules", AlertRuleViewSet, basename="alert-rule")
+router.register(r"alerts", AlertViewSet, basename="alert")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("auth/", include("dj_rest_auth.urls")),
     path("auth/registration/", include("dj_rest_auth.registration.urls")),
+    path(
+        "sensor_readings/async/",
+        sensor_reading_list_create,
+        name="sensor-reading-async-list",
+    ),
+    path(
+        "database_pools/",
+        DatabasePoolStatsView.as_view(),
+        name="database-pool-stats",
+    ),
+    path(
+        "sensor_readings/live/",
+        sensor_reading_live,
+        name="sensor-reading-live",
+    ),
 ]
 
 urlpatterns += router.urls